@@ -0,0 +1,113 @@
+"""
+  Multi-channel MCP3008 reads
+
+  Joystick creates a gpiozero MCP3008 per axis, each one its own SPI device
+  object with its own locking and value conversion per read.  MCP3008Scanner
+  opens the SPI bus once and reads a list of channels (all 8 by default)
+  back to back, with the command frames built up front, into a preallocated
+  NumPy array.
+
+  The MCP3008 only starts a new conversion after chip select goes high, so a
+  scan is still one 3 byte transfer per channel, just with nothing else in
+  between.  That keeps four player pong (two joysticks per ADC) at about the
+  cost of one joystick per frame.
+
+  adc = MCP3008Scanner()
+  readings = adc.scan()             # readings[i], 0 to 1 like MCP3008.value
+
+  p1 = ScannedJoystick(adc, 0, 1, button_gpio=22)
+  p2 = ScannedJoystick(adc, 2, 3, button_gpio=23)
+
+  None of the games use it yet, they all have the one joystick, (pong.py's
+  Joystick, two gpiozero MCP3008s).  It's for a game with more sticks on
+  the same ADC.
+
+"""
+
+import threading
+import time
+import numpy as np
+from gpiozero import Button, SPIDevice
+
+
+class MCP3008Scanner(SPIDevice):
+  BITS = 10
+
+  def __init__(self, channels=range(8), **spi_args):
+    super().__init__(**spi_args)
+    self.channels = list(channels)
+    # start bit, single ended + channel, then clock out the result
+    self.frames = [[0x01, (0x08 | ch) << 4, 0x00] for ch in self.channels]
+    self.readings = np.zeros(len(self.channels))
+    self.index = {ch: i for i, ch in enumerate(self.channels)}
+    self.stamp = 0
+    self.lock = threading.Lock()
+
+  """
+    scan:   read every channel, returns the readings array (reused between scans)
+
+    Scaled the same way as gpiozero's MCP3008.value so joystick calibration
+    doesn't change.
+  """
+  def scan(self):
+    transfer = self._spi.transfer
+    readings = self.readings
+    for (i, frame) in enumerate(self.frames):
+      rx = transfer(frame)
+      raw = ((rx[1] & 0x03) << 8) | rx[2]
+      readings[i] = (2*raw + 1)/(2**(self.BITS + 1) - 1)
+    self.stamp = time.perf_counter_ns()
+    return readings
+
+  """
+    latest:   value of a channel, rescanning when the last scan is older than max_age_ns
+
+    Lets several joysticks on one ADC share a scan, whichever asks first
+    after max_age_ns does the SPI burst for everyone.
+  """
+  def latest(self, channel, max_age_ns=1000000):
+    with self.lock:
+      self.refresh(max_age_ns)
+      return float(self.readings[self.index[channel]])
+
+  # two channels from the same scan, (a joystick's x and y), under one lock
+  def latest_pair(self, a, b, max_age_ns=1000000):
+    with self.lock:
+      self.refresh(max_age_ns)
+      readings = self.readings
+      return (float(readings[self.index[a]]), float(readings[self.index[b]]))
+
+  # rescan if the last scan is older than max_age_ns, (call with lock held)
+  def refresh(self, max_age_ns):
+    if time.perf_counter_ns() - self.stamp > max_age_ns:
+      self.scan()
+
+
+"""
+  ScannedJoystick:    Joystick on a shared MCP3008Scanner
+
+  Same read/get_dv/get_pressed interface as Joystick, so it works with
+  JoystickSampler and State
+"""
+class ScannedJoystick:
+
+  def __init__(self, scanner, chanvx=0, chanvy=1, button_gpio=22, max_age_ns=1000000):
+    self.scanner = scanner
+    self.chanvx = chanvx
+    self.chanvy = chanvy
+    self.max_age_ns = max_age_ns
+    self.button = Button(button_gpio)
+
+  def get_pressed(self):
+    return self.button.is_pressed
+
+  # x and y always come from the same scan
+  def read(self):
+    (vx, vy) = self.scanner.latest_pair(self.chanvx, self.chanvy, self.max_age_ns)
+    return (vx, vy, self.button.is_pressed)
+
+  def get_dv(self, max_dv=6):
+    (vx, vy, _) = self.read()
+    dvx = int(-1*(vx*2 -1)*max_dv)
+    dvy = int((vy*2 - 1)*max_dv)
+    return (dvx,dvy)
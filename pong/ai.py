@@ -0,0 +1,138 @@
+"""
+  Computer controlled paddle
+
+  Predicts where the ball will cross the paddle's face in closed form instead
+  of simulating it forward: x is linear in time, and the wall bounces are
+  folded with modular arithmetic (a ball bouncing between lo and hi is a
+  straight line on a circle of length 2*(hi - lo)).  So the cost is O(1)
+  per frame however far away the ball is, and the same math runs on arrays
+  for every game of a VecPong.
+
+  To make it beatable the paddle sees the ball delay ticks late, and aims
+  with a random error, (a new one every time the ball turns towards it).
+
+  ai = PaddleAI(ball, paddle, lo, hi, home)       # same get_dv as a Joystick
+  (dx, dy) = ai.get_dv(MAX_DV)
+
+  bots = VecPaddleAI(env, side=1)                 # vecpong.VecPong
+  env.step(left_dv, bots.act())
+
+"""
+
+import collections
+import random
+import numpy as np
+
+
+"""
+  predict_y:  where a ball at (x, y) moving (vx, vy) per tick crosses target_x
+
+  lo, hi are where the walls bounce it.  Returns (y, ticks), works on floats
+  and on arrays, vx must not be 0.
+"""
+def predict_y(x, y, vx, vy, target_x, lo, hi):
+  t = (target_x - x)/vx
+  span = hi - lo
+  u = (y + vy*t - lo) % (2*span)
+  return (hi - abs(u - span), t)
+
+
+class PaddleAI:
+
+  """
+    ball, paddle:   pong.Ball and pong.Paddle, read every get_dv
+    lo, hi:         the ball's wall bounce limits, home the y to wait at
+    delay:          reaction time in ticks
+    error:          std dev of the aim in pixels
+    deadzone:       don't move for less than this, (no jitter)
+  """
+  def __init__(self, ball, paddle, lo, hi, home, delay=6, error=20, deadzone=4, rng=None):
+    self.ball = ball
+    self.paddle = paddle
+    self.lo = lo
+    self.hi = hi
+    self.home = home
+    self.deadzone = deadzone
+    self.error = error
+    self.rng = rng if rng is not None else random
+    # the last delay+1 ball states, the paddle reacts to the oldest
+    self.seen = collections.deque(maxlen=delay + 1)
+    self.offset = 0
+    self.coming = False
+
+  # the x the ball's center is at when it touches the paddle's face
+  def face(self, x):
+    paddle = self.paddle
+    if paddle.x > x:
+      return paddle.x - self.ball.radius
+    return paddle.x + paddle.width + self.ball.radius
+
+  def target(self):
+    ball = self.ball
+    self.seen.append((ball.x, ball.y, ball.vx, ball.vy))
+    (x, y, vx, vy) = self.seen[0]
+    face = self.face(x)
+    coming = (face - x)*vx > 0
+    if coming and not self.coming:
+      self.offset = self.rng.gauss(0, self.error)
+    self.coming = coming
+    if not coming:
+      return self.home
+    (ty, _) = predict_y(x, y, vx, vy, face, self.lo, self.hi)
+    return ty + self.offset
+
+  def get_dv(self, max_dv=6):
+    paddle = self.paddle
+    dy = self.target() - (paddle.y + paddle.height/2)
+    if abs(dy) <= self.deadzone:
+      return (0, 0)
+    return (0, int(max(-max_dv, min(max_dv, dy))))
+
+  def get_pressed(self):
+    return False
+
+
+"""
+  VecPaddleAI:    PaddleAI for one side of every game in a vecpong.VecPong
+
+  side 0 is the left paddle, 1 the right.  act() returns the (N, 2) dv for
+  env.step, call it once per step.
+"""
+class VecPaddleAI:
+
+  def __init__(self, env, side=1, delay=6, error=20, deadzone=4, rng=None):
+    self.env = env
+    self.side = side
+    self.deadzone = deadzone
+    self.error = error
+    self.rng = rng if rng is not None else np.random.default_rng()
+    # ring of the last delay+1 (x, y, vx, vy), per game
+    self.seen = np.zeros((delay + 1, 4, env.n))
+    self.ticks = 0
+    self.offset = np.zeros(env.n)
+    self.coming = np.zeros(env.n, dtype=bool)
+
+  def act(self):
+    env = self.env
+    seen = self.seen
+    size = len(seen)
+    seen[self.ticks % size] = (env.x, env.y, env.vx, env.vy)
+    self.ticks += 1
+    # the oldest entry, (the newest until the ring has filled)
+    (x, y, vx, vy) = seen[self.ticks % size] if self.ticks >= size else seen[0]
+
+    padx = env.padx[self.side]
+    r = env.radius
+    face = padx - r if self.side == 1 else padx + env.PADDLE_W + r
+    coming = (face - x)*vx > 0
+    new = coming & ~self.coming
+    self.offset[new] = self.rng.normal(0, self.error, np.count_nonzero(new))
+    self.coming = coming
+
+    (ty, _) = predict_y(x, y, np.where(vx == 0, 1, vx), vy, face, env.padding, env.height + env.padding)
+    target = np.where(coming, ty + self.offset, env.height//2)
+    dy = target - (env.pady[self.side] + env.PADDLE_H/2)
+    dy = np.where(np.abs(dy) <= self.deadzone, 0, np.clip(dy, -env.max_dv, env.max_dv))
+    dv = np.zeros((env.n, 2), dtype=np.int64)
+    dv[:, 1] = np.trunc(dy)
+    return dv
@@ -0,0 +1,188 @@
+"""
+  Assets and cold start
+
+  pygame.init() starts every pygame module (joystick, camera, ...), and the
+  first pygame.font.SysFont call scans the system font directories (fc-list),
+  which takes seconds on a Pi SD card.  Assets only starts the modules a game
+  uses, resolves font names through an index cached on disk, and loads sound
+  effects on a background thread so the BEGIN screen is up before the WAVs
+  are read, (music is streamed, see music.py).
+  Every step is timed for the startup report.
+
+  assets = Assets()
+  assets.init("display", "font", "mixer")
+  font = assets.font("NotoSansMono-Bold", 35)
+  beep = assets.sound("wav/beep.wav")         # PendingSound, loads in the background
+  music = assets.music("wav/smartguy.wav")    # streamed, see music.py
+  ...
+  assets.mark("first frame")
+  print(assets.report())
+
+  The index maps a font name to its file, ("" when the font isn't installed,
+  pygame's default font is used like SysFont does).  It's only kept on disk
+  when asked for, Assets(FONT_INDEX) in the games' main(), headless runs and
+  benchmarks keep it in memory.  Delete FONT_INDEX after installing fonts.
+
+  A sound that can't be loaded, (the WAVs aren't checked in), is reported
+  once and plays as silence.
+
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+import pygame
+from music import Music
+
+FONT_INDEX = os.path.expanduser("~/.cache/pong/fonts.json")
+MODULES = {"display": pygame.display, "font": pygame.font, "mixer": pygame.mixer}
+
+
+# same normalization as SysFont, "NotoSansMono-Bold" -> "notosansmonobold"
+def simplename(name):
+  return "".join(c.lower() for c in name if c.isalnum())
+
+
+class Assets:
+
+  # index is where the font index is cached, None keeps it in memory only
+  def __init__(self, index=None):
+    self.t0 = time.perf_counter()
+    # seconds spent per step, and seconds since start for marks
+    self.timings = {}
+    self.marks = {}
+    self.path = index
+    self.index = None
+    self.fonts = {}
+    self.sounds = {}
+
+  @contextmanager
+  def timed(self, label):
+    t = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.timings[label] = self.timings.get(label, 0.0) + time.perf_counter() - t
+
+  # init only the named pygame modules, see MODULES
+  def init(self, *modules):
+    for name in modules:
+      module = MODULES[name]
+      if not module.get_init():
+        with self.timed(name):
+          module.init()
+
+  def mark(self, label):
+    self.marks[label] = time.perf_counter() - self.t0
+
+  def report(self):
+    steps = ", ".join(f"{label} {1000*t:.0f}ms" for (label, t) in self.timings.items())
+    marks = ", ".join(f"{label} at {1000*t:.0f}ms" for (label, t) in self.marks.items())
+    return f"startup: {steps}" + (f" | {marks}" if marks else "")
+
+  def load_index(self):
+    if self.path is None:
+      return {}
+    try:
+      with open(self.path) as f:
+        return json.load(f)
+    except (OSError, ValueError):
+      return {}
+
+  def save_index(self):
+    if self.path is None:
+      return
+    try:
+      os.makedirs(os.path.dirname(self.path), exist_ok=True)
+      with open(self.path, "w") as f:
+        json.dump(self.index, f, indent=1)
+    except OSError:
+      # read only home, the index is rebuilt next time
+      pass
+
+  """
+    font_path:  file for a font name, None for pygame's default font
+
+    Only scans the system fonts, (once per process, inside pygame), for names
+    that aren't in the index yet or whose file has gone away.
+  """
+  def font_path(self, name):
+    if self.index is None:
+      self.index = self.load_index()
+    key = simplename(name)
+    path = self.index.get(key)
+    if path is None or (path and not os.path.exists(path)):
+      with self.timed("font scan"):
+        path = pygame.font.match_font(name) or ""
+      self.index[key] = path
+      self.save_index()
+    return path or None
+
+  def font(self, name, size):
+    font = self.fonts.get((name, size))
+    if font is None:
+      self.init("font")
+      path = self.font_path(name)
+      with self.timed("fonts"):
+        font = pygame.font.Font(path, size)
+      self.fonts[(name, size)] = font
+    return font
+
+  # short effects, fully loaded for low latency
+  def sound(self, path):
+    sound = self.sounds.get(path)
+    if sound is None:
+      self.init("mixer")
+      sound = self.sounds[path] = PendingSound(path, self)
+    return sound
+
+  # background tracks, streamed from disk
+  def music(self, path):
+    self.init("mixer")
+    return Music(path)
+
+
+"""
+  PendingSound:   a pygame.mixer.Sound loading on its own thread
+
+  play() waits for the load to finish, (it's normally done long before the
+  first play).  If the file couldn't be loaded the error is printed once and
+  play() does nothing, like a silent sound.
+"""
+class PendingSound:
+
+  def __init__(self, path, assets=None):
+    self.path = path
+    self.assets = assets
+    self.sound = None
+    self.error = None
+    self.loaded = threading.Event()
+    threading.Thread(target=self.load, name=f"load {path}", daemon=True).start()
+
+  def load(self):
+    t = time.perf_counter()
+    try:
+      self.sound = pygame.mixer.Sound(self.path)
+    except (pygame.error, OSError) as e:
+      self.error = e
+      print(f"sound {self.path}: {e}, playing silence")
+    if self.assets:
+      self.assets.timings[f"load {self.path}"] = time.perf_counter() - t
+    self.loaded.set()
+
+  # the Sound, None if it couldn't be loaded
+  def get(self):
+    self.loaded.wait()
+    return self.sound
+
+  def play(self, *args, **kwargs):
+    sound = self.get()
+    if sound is None:
+      return None
+    return sound.play(*args, **kwargs)
+
+  def stop(self):
+    if self.sound:
+      self.sound.stop()
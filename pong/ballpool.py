@@ -0,0 +1,224 @@
+"""
+  Structure of arrays ball pool
+
+  Holds every ball in NumPy arrays (positions, velocities, radii, colors)
+  instead of a list of Ball objects, and updates them with batched kernels:
+
+  update()            move, bounce off the walls, reset escaped balls
+  collide_balls()     elastic ball to ball collisions, candidates from a UniformGrid
+  collide_paddle()    bounce off the paddle faces for every ball at once,
+                      or only for the candidates near the paddle
+
+  Only the first n slots are live.  When the pool is full new balls overwrite
+  random slots, the same as State.add_ball always did with MAX_BALLS.
+
+"""
+
+import numpy as np
+import pygame
+
+WHITE = (255,255,255)
+
+
+class BallPool:
+
+  def __init__(self, capacity, width, height, rng=None):
+    self.capacity = capacity
+    self.width = width
+    self.height = height
+    self.rng = rng if rng is not None else np.random.default_rng()
+    self.n = 0
+
+    # positions and velocities are whole pixels, floats keep the kernels simple
+    self.x = np.zeros(capacity)
+    self.y = np.zeros(capacity)
+    # positions at the start of the tick, for render interpolation
+    self.px = np.zeros(capacity)
+    self.py = np.zeros(capacity)
+    self.vx = np.zeros(capacity)
+    self.vy = np.zeros(capacity)
+    self.r = np.zeros(capacity, dtype=np.int32)
+    self.color = np.zeros((capacity, 3), dtype=np.uint8)
+    # where the balls were that hit the paddle, in the last collide_paddle with hits
+    self.hit_x = np.zeros(0)
+    self.hit_y = np.zeros(0)
+
+  def __len__(self):
+    return self.n
+
+  """
+    spawn:    add a batch of balls, arguments are scalars or arrays of equal length
+
+    vx, vy default to random launch velocities (Ball.set_v), returns the slots used
+  """
+  def spawn(self, x, y, r, vx=None, vy=None, color=WHITE):
+    x = np.atleast_1d(x)
+    k = len(x)
+    if vx is None:
+      vx = self.rng.integers(3, 7, size=k)
+    if vy is None:
+      vy = self.rng.integers(0, 6, size=k)
+
+    # fill free slots first, then overwrite random live balls
+    free = min(k, self.capacity - self.n)
+    slots = np.arange(self.n, self.n + free)
+    if free < k:
+      slots = np.concatenate((slots, self.rng.integers(0, self.capacity, size=k - free)))
+    self.n += free
+
+    self.x[slots] = x
+    self.y[slots] = y
+    self.px[slots] = x
+    self.py[slots] = y
+    self.r[slots] = r
+    self.vx[slots] = vx
+    self.vy[slots] = vy
+    self.color[slots] = color
+    return slots
+
+  def clear(self):
+    self.n = 0
+
+  # remember positions at the start of a tick, (loop.py)
+  def snapshot(self):
+    n = self.n
+    self.px[:n] = self.x[:n]
+    self.py[:n] = self.y[:n]
+
+  # move every live ball, bounce off the walls, reset the ones that got out
+  def update(self):
+    n = self.n
+    x, y, vx, vy = self.x[:n], self.y[:n], self.vx[:n], self.vy[:n]
+    x += vx
+    y += vy
+
+    # Collision with boundary checking
+    np.negative(vx, out=vx, where=(x <= 0) | (x >= self.width))
+    np.negative(vy, out=vy, where=(y <= 0) | (y >= self.height))
+
+    # escaped balls go back to the center with a new velocity
+    out = (x < 0) | (x > self.width) | (y < 0) | (y > self.height)
+    k = np.count_nonzero(out)
+    if k:
+      x[out] = self.width//2
+      y[out] = self.height//2
+      # no interpolating across the jump back to the center
+      self.px[:n][out] = self.width//2
+      self.py[:n][out] = self.height//2
+      vx[out] = self.rng.integers(3, 7, size=k)
+      vy[out] = self.rng.integers(0, 6, size=k)
+
+  """
+    collide_balls:    resolve ball to ball collisions as elastic collisions
+
+    grid is a broadphase.UniformGrid with cells at least one ball diameter wide,
+    it's rebuilt here and can then be reused by collide_paddle.  Mass goes with
+    area (r^2), only pairs that overlap and are moving together are resolved.
+    Returns the number of collisions.
+  """
+  def collide_balls(self, grid):
+    n = self.n
+    x, y, vx, vy, r = self.x[:n], self.y[:n], self.vx[:n], self.vy[:n], self.r[:n]
+    grid.build(x, y)
+    (i, j) = grid.pairs()
+
+    # narrowphase, overlapping pairs
+    dx = x[j] - x[i]
+    dy = y[j] - y[i]
+    d2 = dx*dx + dy*dy
+    rr = r[i] + r[j]
+    hit = (d2 < rr*rr) & (d2 > 0)
+    i, j, dx, dy, d2 = i[hit], j[hit], dx[hit], dy[hit], d2[hit]
+
+    # only resolve pairs moving towards each other, otherwise they stick
+    d = np.sqrt(d2)
+    nx = dx/d
+    ny = dy/d
+    vn = (vx[j] - vx[i])*nx + (vy[j] - vy[i])*ny
+    closing = vn < 0
+    i, j, nx, ny, vn = i[closing], j[closing], nx[closing], ny[closing], vn[closing]
+
+    # impulses along the contact normal, summed with bincount since a ball
+    # can be in several pairs
+    mi = r[i].astype(float)**2
+    mj = r[j].astype(float)**2
+    k = 2*vn/(mi + mj)
+    ij = np.concatenate((i, j))
+    vx += np.bincount(ij, np.concatenate((k*mj*nx, -k*mi*nx)), minlength=n)
+    vy += np.bincount(ij, np.concatenate((k*mj*ny, -k*mi*ny)), minlength=n)
+    return len(i)
+
+  """
+    collide_paddle:   ball to paddle collisions for every live ball
+
+    The rules rainbow_pong's old per ball check_collision had, reflect off the
+    paddle faces only when moving into them, returns the number of hits (the
+    score increment).  The balls that hit are at hit_x, hit_y.
+
+    With a grid (built by collide_balls this frame) only the balls in cells
+    around the paddle go through the narrowphase.
+  """
+  def collide_paddle(self, paddle, grid=None):
+    n = self.n
+    px, py = paddle.x, paddle.y
+    pr, pb = paddle.x + paddle.width, paddle.y + paddle.height
+
+    if grid is None:
+      idx = slice(0, n)
+    else:
+      # balls touching the paddle have their centers within a cell of it
+      idx = grid.query(px - grid.cell, py - grid.cell, pr + grid.cell, pb + grid.cell)
+      if len(idx) == 0:
+        return 0
+    x, y, vx, vy, r = self.x[idx], self.y[idx], self.vx[idx], self.vy[idx], self.r[idx]
+
+    in_y = (y > py) & (y < pb)
+    # left side
+    left = (x <= px) & (x + r >= px) & in_y & (vx > 0)
+    np.negative(vx, out=vx, where=left)
+    # right side
+    right = (x >= pr) & (x - r <= pr) & in_y & (vx < 0)
+    np.negative(vx, out=vx, where=right)
+
+    # top and bottom
+    in_x = (x >= px) & (x <= pr)
+    top = in_x & (y <= py) & (y >= py - r)
+    vy[top & (vy == 0)] = -2
+    np.negative(vy, out=vy, where=top & (vy > 0))
+
+    bottom = in_x & (y >= pb) & (y <= pb + r)
+    vy[bottom & (vy == 0)] = 2
+    np.negative(vy, out=vy, where=bottom & (vy < 0))
+
+    if grid is not None:
+      # fancy indexing made copies, write them back
+      self.vx[idx] = vx
+      self.vy[idx] = vy
+
+    hits = int(np.count_nonzero(left) + np.count_nonzero(right)
+               + np.count_nonzero(top) + np.count_nonzero(bottom))
+    if hits:
+      hit = left | right | top | bottom
+      self.hit_x = x[hit]
+      self.hit_y = y[hit]
+    return hits
+
+  # returns the drawn Rects, (for dirty rect updates), sprites is a BallSprites atlas
+  # scale is the render target's, (scaling.py)
+  def draw(self, win, alpha=1.0, sprites=None, scale=1.0):
+    n = self.n
+    # interpolate between the last two ticks
+    px, py = self.px[:n], self.py[:n]
+    x = px + (self.x[:n] - px)*alpha
+    y = py + (self.y[:n] - py)*alpha
+    r = self.r[:n]
+    if scale != 1.0:
+      x *= scale
+      y *= scale
+      r = np.maximum(1, np.rint(r*scale)).astype(np.int32)
+    if sprites is not None:
+      return sprites.draw(win, x, y, r, self.color[:n])
+    circle = pygame.draw.circle
+    return [circle(win, c, (x, y), r)
+            for x, y, r, c in zip(x.tolist(), y.tolist(),
+                                  r.tolist(), self.color[:n].tolist())]
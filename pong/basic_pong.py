@@ -15,6 +15,8 @@
 
 import pygame
 import random
+from layers import Compositor, midline
+from loop import FixedStep, lerp
 pygame.init()
 
 WIDTH, HEIGHT = 700,500
@@ -24,6 +26,8 @@ pygame.display.set_caption("Hello Pong")
 
 # throttle with FPS 
 FPS = 60
+# physics ticks per second, independent of the render FPS
+TICK_RATE = 60
 
 
 # Some colors 
@@ -48,6 +52,12 @@ class Ball:
     self.y = y
     self.set_v()
     self.radius = radius
+    self.snapshot()
+
+  # remember the position at the start of a tick, for render interpolation
+  def snapshot(self):
+    self.px = self.x
+    self.py = self.y
 
   def set_v(self):
     self.vx = random.randint(3,6)
@@ -59,6 +69,7 @@ class Ball:
     self.x = WIDTH//2
     self.y = HEIGHT//2
     self.set_v()
+    self.snapshot()
 
   def update(self):
     self.x += self.vx
@@ -78,8 +89,9 @@ class Ball:
   def left_col(self, x, y, height):
     pass
 
-  def draw(self, win):
-    pygame.draw.circle(win, self.COLOR, (self.x, self.y), self.radius)
+  def draw(self, win, alpha=1.0):
+    pos = (lerp(self.px, self.x, alpha), lerp(self.py, self.y, alpha))
+    pygame.draw.circle(win, self.COLOR, pos, self.radius)
     
   
 class Paddle:
@@ -96,6 +108,11 @@ class Paddle:
     self.height = height
     self.vx = vx
     self.vy = vy
+    self.snapshot()
+
+  def snapshot(self):
+    self.px = self.x
+    self.py = self.y
 
 
   # Idea here, update x y coords, then keep a velocity param as well, but only process ~ once per second
@@ -133,8 +150,10 @@ class Paddle:
     self.ivxn+=1
     self.ivxp+=1
 
-  def draw(self, win):
-    pygame.draw.rect(win, self.COLOR, (self.x, self.y, self.width, self.height))
+  def draw(self, win, alpha=1.0):
+    x = lerp(self.px, self.x, alpha)
+    y = lerp(self.py, self.y, alpha)
+    pygame.draw.rect(win, self.COLOR, (x, y, self.width, self.height))
 
 # Collisions - if ball is moving right and hits left side of paddle
 def check_collision(ball, paddle):
@@ -165,20 +184,18 @@ def check_collision(ball, paddle):
 
 
 
+# background and mid line, baked once
+LAYERS = Compositor((WIDTH, HEIGHT))
+
 # Here update the canvas
-def draw(win, objs):
+def draw(win, objs, alpha=1.0):
   
-  # Draw any canvas details
-  win.fill(BLACK)
-  # draw a mid line
-  start_y, len_y = 20, 20
-  while(start_y < HEIGHT):
-    pygame.draw.line(win, WHITE, (WIDTH//2-5, start_y), (WIDTH//2-5, start_y + len_y), 10)
-    start_y += 2*len_y
+  # Draw any canvas details, (background with a mid line)
+  win.blit(LAYERS.background(BLACK, (midline,)), (0, 0))
   
   # Draw game objects
   for obj in objs:
-    obj.draw(win)
+    obj.draw(win, alpha)
 
   pygame.display.update()
 
@@ -191,6 +208,7 @@ def main():
   paddle = Paddle(WIDTH - 20, HEIGHT - 200, 15, 150)
   ball = Ball(WIDTH//2, HEIGHT//2, RADIUS)
   objs = [paddle,ball]
+  steps = FixedStep(TICK_RATE)
   while run:
     clock.tick(FPS)
 
@@ -202,15 +220,19 @@ def main():
 
     
     keys = pygame.key.get_pressed()
-    paddle.update(keys)
-    ball.update()
-    check_collision(ball, paddle)
-
-    # check collisions
-    ball.left_col(paddle.x, paddle.y, paddle.height)
-
-    ## Update canvas
-    draw(WIN, objs)
+    # physics at the fixed tick rate
+    for _ in range(steps.advance()):
+      for obj in objs:
+        obj.snapshot()
+      paddle.update(keys)
+      ball.update()
+      check_collision(ball, paddle)
+
+      # check collisions
+      ball.left_col(paddle.x, paddle.y, paddle.height)
+
+    ## Update canvas, interpolated between the last two ticks
+    draw(WIN, objs, steps.alpha)
 
 
 
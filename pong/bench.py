@@ -0,0 +1,228 @@
+#!/usr/bin/python
+"""
+  Benchmarks for the pong engines, runs anywhere (no Pi, no window)
+
+  Uses SDL's dummy video/audio drivers and gpiozero's mock pin factory, so
+  pong.State, rainbow_pong.State and basic_pong run on a plain Linux box.
+  Each game is measured in three modes at several resolutions and ball counts:
+
+    update    game logic only, (update_state / update + collisions)
+    draw      rendering only, the state doesn't change
+    full      update + draw, like one iteration of main() without the tick
+
+  and the results go to a JSON file to compare across commits:
+
+  python bench.py --out bench.json
+  python bench.py --quick
+
+"""
+
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("GPIOZERO_PIN_FACTORY", "mock")
+
+import argparse
+import json
+import platform
+import subprocess
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pygame
+from gpiozero import Device
+
+import basic_pong
+import pong
+import rainbow_pong
+from layers import Compositor
+from render import KeyState
+
+MODES = ("update", "draw", "full")
+
+
+# run the game at another resolution, the games read WIDTH/HEIGHT as module globals,
+# (and basic_pong bakes its background into LAYERS at import, at its own size)
+@contextmanager
+def resolution(module, size):
+  saved = (module.WIDTH, module.HEIGHT, getattr(module, "LAYERS", None))
+  (module.WIDTH, module.HEIGHT) = size
+  if saved[2] is not None:
+    module.LAYERS = Compositor(size)
+  win = pygame.display.set_mode(size)
+  try:
+    yield win
+  finally:
+    (module.WIDTH, module.HEIGHT) = saved[:2]
+    if saved[2] is not None:
+      module.LAYERS = saved[2]
+
+
+"""
+  timeit:   call step() up to frames times or for at most seconds, returns (frames, seconds)
+"""
+def timeit(step, frames, seconds):
+  n = 0
+  t0 = time.perf_counter()
+  deadline = t0 + seconds
+  while n < frames:
+    step()
+    n += 1
+    if n % 16 == 0 and time.perf_counter() > deadline:
+      break
+  dt = time.perf_counter() - t0
+  return (n, dt)
+
+
+def close_joystick(joystick):
+  for device in (joystick.Vx, joystick.Vy, joystick.button):
+    device.close()
+
+
+# Pong has the one ball, no ball counts
+def bench_pong(size, mode, frames, seconds):
+  with resolution(pong, size) as win:
+    joystick = pong.Joystick()
+    state = pong.State(joystick)
+    state.state = state.STATE.PLAY
+    renderer = pong.PygameRenderer(win)
+    keys = KeyState([pygame.K_s])
+
+    def update():
+      state.update_state(keys)
+
+    def draw():
+      renderer.draw(state)
+
+    def full():
+      state.update_state(keys)
+      renderer.draw(state)
+
+    try:
+      return timeit({"update": update, "draw": draw, "full": full}[mode], frames, seconds)
+    finally:
+      close_joystick(joystick)
+
+
+def bench_rainbow(size, mode, frames, seconds, balls):
+  with resolution(rainbow_pong, size) as win:
+    (width, height) = size
+    joystick = rainbow_pong.Joystick()
+    paddle = rainbow_pong.Paddle(width - 20, height - 200, 30, 200)
+    state = rainbow_pong.State(paddle, rainbow_pong.Ball(width//2, height//2, rainbow_pong.RADIUS), storm=True)
+    # spread the extra balls over the field
+    rng = np.random.default_rng(0)
+    k = balls - 1
+    if k > 0:
+      r = rainbow_pong.RADIUS
+      state.balls.spawn(rng.integers(0, width, k), rng.integers(0, height, k),
+                        r + rng.integers(0, r, k, endpoint=True))
+    keys = KeyState()
+
+    def update():
+      paddle.update(*joystick.get_dv())
+      state.update_state(keys)
+
+    def draw():
+      state.draw(win)
+
+    def full():
+      paddle.update(*joystick.get_dv())
+      state.update_state(keys)
+      state.draw(win)
+
+    try:
+      return timeit({"update": update, "draw": draw, "full": full}[mode], frames, seconds)
+    finally:
+      close_joystick(joystick)
+
+
+def bench_basic(size, mode, frames, seconds, balls):
+  with resolution(basic_pong, size) as win:
+    (width, height) = size
+    paddle = basic_pong.Paddle(width - 20, height - 200, 15, 150)
+    objs = [paddle] + [basic_pong.Ball(width//2, height//2, basic_pong.RADIUS) for _ in range(balls)]
+    keys = KeyState([pygame.K_w])
+
+    def update():
+      paddle.update(keys)
+      for ball in objs[1:]:
+        ball.update()
+        basic_pong.check_collision(ball, paddle)
+
+    def draw():
+      basic_pong.draw(win, objs)
+
+    def full():
+      update()
+      draw()
+
+    return timeit({"update": update, "draw": draw, "full": full}[mode], frames, seconds)
+
+
+GAMES = {
+  "pong": (bench_pong, [(1200, 600), (1920, 1080)], None),
+  "rainbow_pong": (bench_rainbow, [(1400, 800), (1920, 1080)], [1, 100, 1000, 5000]),
+  "basic_pong": (bench_basic, [(700, 500), (1920, 1080)], [1, 100]),
+}
+QUICK = {
+  "pong": ([(1200, 600)], None),
+  "rainbow_pong": ([(1400, 800)], [1, 1000]),
+  "basic_pong": ([(700, 500)], [1]),
+}
+
+
+def commit():
+  try:
+    return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                          text=True, check=True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark the pong engines headless")
+  parser.add_argument("--out", default="bench.json", help="JSON results file")
+  parser.add_argument("--frames", type=int, default=2000, help="max frames per run")
+  parser.add_argument("--seconds", type=float, default=2.0, help="max seconds per run")
+  parser.add_argument("--games", nargs="*", default=list(GAMES), choices=list(GAMES))
+  parser.add_argument("--quick", action="store_true", help="one resolution, fewer ball counts")
+  args = parser.parse_args()
+
+  pygame.init()
+  results = []
+  for game in args.games:
+    (bench, sizes, counts) = GAMES[game]
+    if args.quick:
+      (sizes, counts) = QUICK[game]
+    for size in sizes:
+      # (None for a game without ball counts)
+      for balls in counts or [None]:
+        for mode in MODES:
+          (n, dt) = bench(size, mode, args.frames, args.seconds, *([balls] if balls else []))
+          fps = n/dt if dt > 0 else 0.0
+          results.append({"game": game, "mode": mode, "size": list(size), "balls": balls or 1,
+                          "frames": n, "seconds": dt, "fps": fps})
+          print(f"{game:<13} {mode:<7} {size[0]:>4}x{size[1]:<4} balls {balls or 1:>5}  {fps:10.1f} fps")
+          # the joysticks claim the same mock pins every run
+          if Device.pin_factory is not None:
+            Device.pin_factory.reset()
+
+  report = {
+    "commit": commit(),
+    "python": platform.python_version(),
+    "pygame": pygame.version.ver,
+    "numpy": np.__version__,
+    "machine": platform.machine(),
+    "frames": args.frames,
+    "seconds": args.seconds,
+    "results": results,
+  }
+  with open(args.out, "w") as f:
+    json.dump(report, f, indent=2)
+  pygame.quit()
+
+
+if __name__=="__main__":
+  main()
@@ -0,0 +1,93 @@
+"""
+  Uniform grid broadphase
+
+  Bins points into square cells every frame so only balls in the same or
+  neighbouring cells are tested against each other.  With the cell size at
+  least one ball diameter, a collision can only happen between neighbouring
+  cells, so the candidate count stays proportional to the number of balls
+  instead of n^2.
+
+  build(x, y)       bin the points, a stable sort on small int cell ids
+                    (NumPy uses a radix sort for those)
+  pairs()           candidate (i, j) index pairs, each pair once
+  query(rect)       indices of points in the cells overlapping a rect
+
+"""
+
+import numpy as np
+
+
+class UniformGrid:
+
+  # neighbour cells visited from each cell, half the 3x3 block so every
+  # pair of cells is only visited once
+  OFFSETS = [(0,0), (1,0), (-1,1), (0,1), (1,1)]
+
+  def __init__(self, width, height, cell):
+    self.cell = cell
+    # one padding cell on every side so neighbour lookups never leave the grid,
+    # points outside the field are clamped into the edge cells
+    self.gw = width//cell + 1
+    self.gh = height//cell + 1
+    self.cols = self.gw + 2
+    self.rows = self.gh + 2
+    ncells = self.cols*self.rows
+    self.dtype = np.int16 if ncells < 2**15 else np.int32
+    self.cells = np.arange(ncells)
+    self.n = 0
+
+  def cell_of(self, x, y):
+    cx = np.clip(x//self.cell, 0, self.gw - 1).astype(self.dtype) + 1
+    cy = np.clip(y//self.cell, 0, self.gh - 1).astype(self.dtype) + 1
+    return cy*self.cols + cx
+
+  def build(self, x, y):
+    self.n = len(x)
+    cid = self.cell_of(x, y)
+    # order: point indices sorted by cell, start/end: slice of order per cell
+    self.order = np.argsort(cid, kind="stable")
+    self.cid = cid[self.order]
+    self.start = np.searchsorted(self.cid, self.cells, side="left")
+    self.end = np.searchsorted(self.cid, self.cells, side="right")
+
+  """
+    pairs:    candidate pairs (i, j) as two index arrays into the built points
+  """
+  def pairs(self):
+    p = np.arange(self.n)
+    cid = self.cid.astype(np.intp)
+    I = []
+    J = []
+    for (dx, dy) in self.OFFSETS:
+      nc = cid + dy*self.cols + dx
+      if (dx, dy) == (0,0):
+        # same cell, only the points sorted after this one
+        lo = p + 1
+      else:
+        lo = self.start[nc]
+      counts = self.end[nc] - lo
+      total = counts.sum()
+      if total == 0:
+        continue
+      # expand each [lo, end) range into individual partner positions
+      first = np.cumsum(counts) - counts
+      I.append(np.repeat(p, counts))
+      J.append(np.repeat(lo - first, counts) + np.arange(total))
+
+    if not I:
+      empty = np.empty(0, dtype=np.intp)
+      return (empty, empty)
+    return (self.order[np.concatenate(I)], self.order[np.concatenate(J)])
+
+  """
+    query:    indices of points in the cells overlapping (x0, y0) - (x1, y1)
+  """
+  def query(self, x0, y0, x1, y1):
+    c0 = int(np.clip(x0//self.cell, 0, self.gw - 1)) + 1
+    c1 = int(np.clip(x1//self.cell, 0, self.gw - 1)) + 1
+    r0 = int(np.clip(y0//self.cell, 0, self.gh - 1)) + 1
+    r1 = int(np.clip(y1//self.cell, 0, self.gh - 1)) + 1
+    # cells in a row are contiguous in the sorted order
+    chunks = [self.order[self.start[r*self.cols + c0]:self.end[r*self.cols + c1]]
+              for r in range(r0, r1 + 1)]
+    return np.concatenate(chunks)
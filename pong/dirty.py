@@ -0,0 +1,69 @@
+"""
+  Dirty rectangle tracking
+
+  Instead of filling and flipping the whole window every frame, only the
+  areas drawn last frame are erased and only the areas drawn last frame and
+  this frame are passed to pygame.display.update(rects).
+
+  rects = DirtyRects()
+  rects.begin(win, background)      # erase last frame's objects
+  rects.add(ball.draw(win))         # pygame draw calls and blits return Rects
+  rects.end()                       # display.update of old + new rects
+
+  The background is a color or a pre-composited Surface (layers.py), erasing
+  blits the background back over the old rects.  Falls back to a full
+  redraw and flip when the background changes (the rainbow HYPE states) or
+  there are too many rects for a partial update to pay off, e.g. ball storm.
+
+"""
+
+import pygame
+
+
+class DirtyRects:
+  # above this many rects a full flip is cheaper
+  MAX_RECTS = 150
+
+  def __init__(self):
+    self.prev = []
+    self.cur = []
+    self.bg = None
+    self.full = True
+
+  # force a full fill and flip next frame, (window changed etc.)
+  def invalidate(self):
+    self.full = True
+
+  def begin(self, win, bg):
+    if bg != self.bg:
+      self.bg = bg
+      self.full = True
+    full = self.full or len(self.prev) > self.MAX_RECTS
+    if isinstance(bg, pygame.Surface):
+      if full:
+        win.blit(bg, (0, 0))
+      else:
+        for rect in self.prev:
+          win.blit(bg, rect, rect)
+    elif full:
+      win.fill(bg)
+    else:
+      for rect in self.prev:
+        win.fill(bg, rect)
+
+  def add(self, rect):
+    if rect:
+      self.cur.append(rect)
+
+  def extend(self, rects):
+    self.cur.extend(rects)
+
+  # full: flip the whole window anyway, (a scaled render target covers all of it)
+  def end(self, full=False):
+    if full or self.full or len(self.prev) + len(self.cur) > self.MAX_RECTS:
+      pygame.display.update()
+    else:
+      pygame.display.update(self.prev + self.cur)
+    self.prev = self.cur
+    self.cur = []
+    self.full = False
@@ -0,0 +1,62 @@
+"""
+  Frame time hysteresis
+
+  The step down / step back up rule shared by the render scale, (scaling.py),
+  and the effect tiers, (quality.py).  Both watch frame times against a
+  budget and move one level at a time:
+
+    down    the median of the last DOWN_FRAMES frames is over budget, (most
+            of them, one slow frame isn't enough)
+    up      after UP_FRAMES frames, the UP_PERCENTILE one is under HEADROOM
+            of the budget, (well under for a while, but the odd slow frame,
+            a GC pause, doesn't hold it down for good)
+
+  The gap between the two and the longer wait to go up keep it from
+  flapping between levels at the edge of the budget.
+
+  load = Hysteresis(budget_ms, headroom=0.5)
+  step = load.frame(ms, down=level < lowest, up=level > 0)
+  if step:                                # +1 a level down, -1 a level up
+    level += step
+    load.reset()
+
+"""
+
+
+class Hysteresis:
+  DOWN_FRAMES = 30
+  UP_FRAMES = 180
+  UP_PERCENTILE = 90
+
+  def __init__(self, budget_ms, headroom=0.5):
+    self.budget_ms = budget_ms
+    self.headroom = headroom
+    self.times = []
+    # median of the frames the last step was decided on, for logging
+    self.median = 0.0
+
+  """
+    frame:    add a frame's time in ms, returns 1 to step down, -1 to step up, else 0
+
+    down and up say whether there's a level to go to, the caller calls
+    reset() when it steps.
+  """
+  def frame(self, ms, down=True, up=True):
+    times = self.times
+    times.append(ms)
+    if len(times) >= self.DOWN_FRAMES:
+      median = sorted(times[-self.DOWN_FRAMES:])[self.DOWN_FRAMES//2]
+      if median > self.budget_ms and down:
+        self.median = median
+        return 1
+    if len(times) >= self.UP_FRAMES:
+      ordered = sorted(times)
+      high = ordered[len(ordered)*self.UP_PERCENTILE//100]
+      if high < self.headroom*self.budget_ms and up:
+        self.median = ordered[len(ordered)//2]
+        return -1
+      del times[:-self.DOWN_FRAMES]
+    return 0
+
+  def reset(self):
+    self.times = []
@@ -0,0 +1,116 @@
+"""
+  Event driven input
+
+  The games used to poll pygame.key.get_pressed() once a frame and debounce
+  with frame counters, (btn_ctx > 12 for the music toggle, button_ctx > 20
+  between spawned balls).  A tap shorter than a frame could be missed, and
+  the debounce times changed with the frame rate.  Inputs is built from the
+  event queue instead, KEYDOWN/KEYUP and GPIO_BUTTON events posted by
+  gpiozero callbacks, so every change is seen exactly once, when it
+  happens, stamped with perf_counter_ns.
+
+  inputs = Inputs()
+  inputs.watch(joystick.button, "button")     # a GPIO button, any key name
+  for event in pygame.event.get():
+    inputs.handle(event)
+  ...
+  inputs[pygame.K_w]                          # held, (or tapped since the last tick)
+  inputs.went_down(pygame.K_m)                # edges, since the last tick
+  inputs.repeat("button", 0.33)               # on the press, then every 0.33s held
+  inputs.end_tick()                           # after every update_state
+
+  It's a render.KeyState, so a State takes it wherever it took keys.
+
+"""
+
+import time
+import pygame
+from render import KeyState
+
+# posted from gpiozero's callback thread, key, down and t (perf_counter_ns) attributes
+GPIO_BUTTON = pygame.event.custom_type()
+
+
+class Inputs(KeyState):
+
+  def __init__(self, clock=time.perf_counter_ns):
+    super().__init__()
+    self.clock = clock
+    # perf_counter_ns each held key went down
+    self.since = {}
+    # next repeat() due time of held keys
+    self.due = {}
+
+  def press(self, key, t=None):
+    if key not in self.pressed:
+      self.since[key] = t if t is not None else self.clock()
+    super().press(key)
+
+  def release(self, key, t=None):
+    self.since.pop(key, None)
+    self.due.pop(key, None)
+    super().release(key)
+
+  """
+    handle:     update from one pygame event, returns True if it was an input
+  """
+  def handle(self, event):
+    if event.type == pygame.KEYDOWN:
+      self.press(event.key)
+    elif event.type == pygame.KEYUP:
+      self.release(event.key)
+    elif event.type == GPIO_BUTTON:
+      if event.down:
+        self.press(event.key, event.t)
+      else:
+        self.release(event.key, event.t)
+    elif event.type == pygame.WINDOWFOCUSLOST:
+      # the KEYUPs go to some other window
+      for key in list(self.pressed):
+        self.release(key)
+    else:
+      return False
+    return True
+
+  """
+    watch:    post GPIO_BUTTON events for a gpiozero Button, as key
+
+    The callbacks run on gpiozero's thread, pygame.event.post is safe to
+    call from there.  Stamped in the callback, not when the loop gets to it.
+  """
+  def watch(self, button, key):
+    def post(down):
+      pygame.event.post(pygame.event.Event(GPIO_BUTTON, key=key, down=down, t=time.perf_counter_ns()))
+    button.when_pressed = lambda: post(True)
+    button.when_released = lambda: post(False)
+
+  # ns the key has been held for, 0 when it's up
+  def held_ns(self, key):
+    if key not in self.since:
+      return 0
+    return self.clock() - self.since[key]
+
+  """
+    repeat:   True when the key goes down, then every period seconds it stays
+              held, (after delay, which defaults to period)
+
+    Timed from when the key went down, not counted in frames or ticks.
+  """
+  def repeat(self, key, period, delay=None):
+    if delay is None:
+      delay = period
+    if self.went_down(key):
+      # (not for a tap, it's up again already)
+      if key in self.since:
+        self.due[key] = self.since[key] + int(delay*1e9)
+      return True
+    due = self.due.get(key)
+    if due is None:
+      return False
+    now = self.clock()
+    if now < due:
+      return False
+    # one repeat per call, skip the ones missed during a stall
+    due += int(period*1e9)
+    self.due[key] = due if due > now else now + int(period*1e9)
+    return True
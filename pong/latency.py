@@ -0,0 +1,142 @@
+"""
+  Input to photon latency tracer
+
+  button.py measured ~400 us from a GPIO edge to toggling another pin, this
+  measures the rest of the way in pong.py: from an input sample to the
+  display.update that puts its paddle move on screen.  Each trace starts
+  with the input's perf_counter_ns stamp, (JoystickSampler's read time, or
+  when the key events were handled), and is stamped again at the end of
+  each stage:
+
+    sample    the sample waiting to be picked up by update_paddles
+    physics   the rest of update_state, (ball, collisions, state changes)
+    draw      waiting for and drawing the frame, up to display.update
+    flip      display.update
+
+  tracer = LatencyTracer(pin=26)          # pin is optional, see below
+  tracer.keys()                           # after the key events are handled
+  tracer.begin(joystick, keys)            # in update_paddles
+  tracer.mark("physics")                  # end of update_state
+  tracer.mark("draw")
+  pygame.display.update()
+  tracer.flip()
+  print(tracer.format())                  # p50/p99/max per stage, see profiler.TimeRing
+
+  With several ticks in a frame the first tick's input is traced, (the
+  oldest input on screen, the worst case).  The stamp is when the input was
+  read, not when the stick moved, add up to one sampler period for that.
+
+  pin is a GPIO driven at flip time with the traced button state, (the
+  joystick button, [spacebar] without one), the same way button.py drives
+  its LED.  On a scope the delay between the button edge and this pin's
+  edge is the input to flip latency of a real press.
+
+  NullTracer has the same methods and does nothing.
+
+"""
+
+import json
+import time
+import numpy as np
+import pygame
+from gpiozero import DigitalOutputDevice
+from profiler import TimeRing
+
+STAGES = ("sample", "physics", "draw", "flip")
+
+
+class LatencyTracer:
+
+  def __init__(self, frames=600, pin=None):
+    # one row per stage plus the total in the last row, the same rolling
+    # window and percentiles as FrameProfiler
+    self.times = TimeRing(STAGES + ("total",), frames)
+    self.stamps = np.zeros(len(STAGES) + 1, dtype=np.int64)
+    self.column = np.zeros(len(STAGES) + 1, dtype=np.int64)
+    self.index = {s: i + 1 for i, s in enumerate(STAGES)}
+    self.open = False
+    self.pressed = False
+    self.keys_ns = time.perf_counter_ns()
+    self.pin = None
+    if pin is not None:
+      self.pin = DigitalOutputDevice(pin=pin, initial_value=False)
+
+  # the key events were just handled, they're the input when there's no joystick
+  def keys(self):
+    self.keys_ns = time.perf_counter_ns()
+
+  """
+    begin:    the paddles were just moved by this input
+
+    joystick is the State's joystick, None for the keys.  A JoystickSampler
+    (or InputRecorder) says when it read the sample, a plain Joystick reads
+    right now.
+  """
+  def begin(self, joystick, keys):
+    if self.open:
+      return
+    now = time.perf_counter_ns()
+    if joystick:
+      sampled = getattr(joystick, "sampled_ns", None)
+      # 0 before a JoystickSampler's first read
+      self.stamps[0] = (sampled() if sampled else 0) or now
+      self.pressed = joystick.get_pressed()
+    else:
+      self.stamps[0] = self.keys_ns
+      self.pressed = bool(keys[pygame.K_SPACE])
+    self.stamps[1] = now
+    self.open = True
+
+  def mark(self, stage):
+    if self.open:
+      self.stamps[self.index[stage]] = time.perf_counter_ns()
+
+  # display.update returned, close the trace
+  def flip(self):
+    if not self.open:
+      return
+    if self.pin is not None:
+      self.pin.value = self.pressed
+    stamps = self.stamps
+    stamps[-1] = time.perf_counter_ns()
+    column = self.column
+    np.subtract(stamps[1:], stamps[:-1], out=column[:-1])
+    column[-1] = stamps[-1] - stamps[0]
+    self.times.add(column)
+    self.open = False
+
+  @property
+  def traces(self):
+    return self.times.count
+
+  def format(self):
+    return "\n".join(self.times.format("stage"))
+
+  def dump(self, path):
+    data = {
+      "stages": list(STAGES) + ["total"],
+      "traces": self.traces,
+      "percentiles_ms": self.times.percentiles(),
+      "recent_ns": self.times.window().tolist(),
+    }
+    with open(path, "w") as f:
+      json.dump(data, f)
+
+  def close(self):
+    if self.pin is not None:
+      self.pin.close()
+
+
+class NullTracer:
+
+  def keys(self):
+    pass
+
+  def begin(self, joystick, keys):
+    pass
+
+  def mark(self, stage):
+    pass
+
+  def flip(self):
+    pass
@@ -0,0 +1,105 @@
+"""
+  Pre-composited background layers
+
+  Static content (background color, the dashed mid line) used to be redrawn
+  with a fill and ~15 draw.line calls every frame.  Compositor bakes it into a
+  background Surface once and hands back the cached Surface, so a frame is
+  one blit (or a few partial blits with DirtyRects) plus the moving sprites.
+
+  A background is keyed by its color and its layers, a layer is any function
+  paint(surface).  The last few are kept so toggling between colors doesn't
+  rebuild.  A new key (e.g. the rainbow bg cycling every few ticks) is
+  painted into the least recently used surface of its size once the cache
+  is full, with a fill, so cycling doesn't allocate a window sized Surface
+  each time.  The surface last handed back at a size is never the one
+  repainted, (it's what's on screen), so a different background is always a
+  different Surface (DirtyRects relies on that).
+
+  LAYERS = Compositor((WIDTH, HEIGHT))
+  win.blit(LAYERS.background(BLACK, (midline,)), (0, 0))
+
+"""
+
+from collections import OrderedDict
+import pygame
+
+WHITE = (255,255,255)
+
+
+# dashed center line
+def midline(surface, color=WHITE):
+  width, height = surface.get_size()
+  start_y, len_y = 20, 20
+  while(start_y < height):
+    pygame.draw.line(surface, color, (width//2-5, start_y), (width//2-5, start_y + len_y), 10)
+    start_y += 2*len_y
+
+
+class Compositor:
+
+  def __init__(self, size, maxsize=8):
+    self.size = size
+    self.maxsize = maxsize
+    self.surfaces = OrderedDict()
+    # size -> the surface last handed back at that size, never recycled
+    self.last = {}
+    self.builds = 0
+
+  """
+    background:   the Surface for bg color + layers, built on first use
+
+    layers is a tuple of paint(surface) functions, drawn in order.  size is
+    for a smaller render target, (scaling.py), the layers are painted at
+    full size and scaled down into it so they look the same, a plain color
+    is just filled in.
+  """
+  def background(self, bg, layers=(), size=None):
+    if size is None:
+      size = self.size
+    key = (bg, layers, size)
+    surface = self.surfaces.get(key)
+    if surface is not None:
+      self.surfaces.move_to_end(key)
+      self.last[size] = surface
+      return surface
+
+    if size != self.size and layers:
+      full = self.background(bg, layers)
+      surface = self.recycle(size)
+      pygame.transform.smoothscale(full, size, surface)
+    else:
+      surface = self.recycle(size)
+      surface.fill(bg)
+      for paint in layers:
+        paint(surface)
+    self.builds += 1
+    self.surfaces[key] = surface
+    self.last[size] = surface
+    return surface
+
+  """
+    recycle:  a Surface of size to paint a new background into
+
+    Once the cache is full that's its least recently used surface of the same
+    size, taken out of the cache, skipping the last one handed back at that
+    size.  When there's no other one that size, (e.g. just after a render
+    scale step), the oldest is dropped and a new one made.
+  """
+  def recycle(self, size):
+    if len(self.surfaces) >= self.maxsize:
+      shown = self.last.get(size)
+      for (key, surface) in self.surfaces.items():
+        if key[2] == size and surface is not shown:
+          del self.surfaces[key]
+          return surface
+      self.surfaces.popitem(last=False)
+    surface = pygame.Surface(size)
+    if pygame.display.get_surface():
+      # match the display pixel format so blits are plain copies
+      surface = surface.convert()
+    return surface
+
+  # forget cached surfaces, (display mode or layout changed)
+  def clear(self):
+    self.surfaces.clear()
+    self.last.clear()
@@ -0,0 +1,60 @@
+"""
+  Fixed timestep game loop
+
+  Physics used to run once per rendered frame, so a slow frame slowed the
+  whole game down.  FixedStep runs the physics at a constant tick rate, (the
+  velocities stay in pixels per tick), however fast or slow frames render:
+
+  steps = FixedStep(TICK_RATE)
+  while run:
+    clock.tick(FPS)
+    for _ in range(steps.advance()):
+      state.update_state(keys)
+    renderer.draw(state, steps.alpha)
+
+  alpha is how far the accumulator is into the next tick (0 to 1), draw()
+  interpolates between the last two physics states with it.  Objects keep
+  their previous position (px, py) from snapshot() at the start of a tick.
+
+"""
+
+import time
+
+
+def lerp(a, b, alpha):
+  return a + (b - a)*alpha
+
+
+class FixedStep:
+
+  def __init__(self, rate=60, max_steps=5):
+    self.dt = 1.0/rate
+    # don't spiral trying to catch up after a long stall, drop the time instead
+    self.max_steps = max_steps
+    self.acc = 0.0
+    self.last = None
+    self.alpha = 1.0
+
+  """
+    advance:    add the time since the last call, returns the number of ticks to run
+
+    now defaults to time.perf_counter()
+  """
+  def advance(self, now=None):
+    if now is None:
+      now = time.perf_counter()
+    if self.last is None:
+      # first frame, run one tick
+      self.last = now
+      self.acc = self.dt
+    self.acc += now - self.last
+    self.last = now
+
+    steps = int(self.acc/self.dt)
+    if steps > self.max_steps:
+      steps = self.max_steps
+      self.acc = 0.0
+    else:
+      self.acc -= steps*self.dt
+    self.alpha = self.acc/self.dt
+    return steps
@@ -0,0 +1,58 @@
+"""
+  Streaming background music
+
+  pygame.mixer.Sound decodes a whole WAV into RAM, a few minutes of 44.1 kHz
+  stereo is tens of MB per track, on boards that also run other things.
+  Music plays a track through pygame.mixer.music instead, which streams it
+  from disk in small chunks, and loops inside SDL_mixer without a gap.
+  Sound objects are still the right thing for short effects, (low latency,
+  several at once), see Assets.sound.
+
+  music = Music("wav/smartguy.wav")   # same play/stop as a Sound
+  music.play(loops=10)
+  music.stop()
+
+  There is only one music stream, playing a track replaces whatever was
+  playing before.  A track that can't be opened, (the WAVs aren't checked
+  in), is reported once and plays as silence, like a missing Sound.
+
+"""
+
+import pygame
+
+
+class Music:
+  # the track currently loaded into pygame.mixer.music
+  loaded = None
+
+  def __init__(self, path):
+    self.path = path
+    self.error = None
+
+  """
+    play:   loops like Sound.play, (-1 forever), fade_ms fades the track in
+  """
+  def play(self, loops=0, fade_ms=0):
+    if self.error:
+      return
+    if Music.loaded != self.path:
+      try:
+        pygame.mixer.music.load(self.path)
+      except pygame.error as e:
+        self.error = e
+        print(f"music {self.path}: {e}, playing silence")
+        return
+      Music.loaded = self.path
+    pygame.mixer.music.play(loops, fade_ms=fade_ms)
+
+  def stop(self):
+    if Music.loaded == self.path:
+      pygame.mixer.music.stop()
+
+  def fadeout(self, ms):
+    if Music.loaded == self.path:
+      pygame.mixer.music.fadeout(ms)
+
+  @property
+  def playing(self):
+    return Music.loaded == self.path and pygame.mixer.music.get_busy()
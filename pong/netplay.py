@@ -0,0 +1,535 @@
+#!/usr/bin/python
+"""
+  Two player pong over UDP
+
+  The host runs the real pong.State, (left paddle on [w,a,s,d], [spacebar]
+  to start), the client drives the right paddle from another machine.
+
+  client -> host    input packets, the last REDUNDANCY inputs each time so a
+                    lost packet doesn't lose an input, plus the newest
+                    snapshot the client has (the ack)
+  host -> client    one snapshot per tick, sequence numbered and delta
+                    compressed against the last snapshot the client acked,
+                    only the fields that changed are sent
+
+  The client predicts its own paddle, (moves it as soon as the input is
+  read), and the ball between snapshots.  Each snapshot says which input the
+  host applied last, the client resets its paddle to the snapshot and
+  replays the inputs the host hasn't seen yet (reconciliation).
+
+  python netplay.py --host [--port 5005]
+  python netplay.py --connect 192.168.1.20[:5005] [--joystick]
+  python netplay.py --loopback --ticks 3000 --loss 0.1 --delay 0.05
+
+  --loss, --delay and --jitter (seconds) simulate a bad network on what
+  each side sends, --loopback runs host and client in one process, headless
+  and unthrottled, and prints the stats.
+
+"""
+
+import argparse
+import collections
+import heapq
+import random
+import socket
+import struct
+import time
+import pygame
+import pong
+from render import KeyState
+from inputs import Inputs
+
+PORT = 5005
+FPS = 60
+
+INPUT = 1
+SNAPSHOT = 2
+# type, ack snapshot, newest input seq, input count
+INPUT_HEADER = struct.Struct("<BIIB")
+# dx, dy, button
+INPUT_FRAME = struct.Struct("<bbB")
+# type, seq, baseline seq (0 for a full snapshot), last input applied, changed fields mask
+SNAP_HEADER = struct.Struct("<BIIIH")
+REDUNDANCY = 4
+# snapshots kept for delta baselines, on both ends
+HISTORY = 64
+
+# snapshot fields and their wire formats
+FIELDS = (("ball_x", "f"), ("ball_y", "f"), ("ball_vx", "f"), ("ball_vy", "f"),
+          ("left_x", "h"), ("left_y", "h"), ("right_x", "h"), ("right_y", "h"),
+          ("score1", "B"), ("score2", "B"), ("state", "B"))
+FULL = struct.Struct("<" + "".join(f for (_, f) in FIELDS))
+
+
+def snapshot(state):
+  (ball, left, right) = (state.ball, state.lpaddle, state.rpaddle)
+  snap = (ball.x, ball.y, ball.vx, ball.vy, left.x, left.y, right.x, right.y,
+          state.score1, state.score2, state.state.value)
+  # rounded to what goes over the wire, so both ends diff the same values
+  return FULL.unpack(FULL.pack(*snap))
+
+
+def apply(state, snap):
+  (ball, left, right) = (state.ball, state.lpaddle, state.rpaddle)
+  (ball.x, ball.y, ball.vx, ball.vy, left.x, left.y, right.x, right.y,
+   state.score1, state.score2, phase) = snap
+  state.state = state.STATE(phase)
+
+
+def encode(seq, base_seq, base, snap, ack):
+  mask = 0
+  fmt = "<"
+  values = []
+  for (i, value) in enumerate(snap):
+    if base is None or value != base[i]:
+      mask |= 1 << i
+      fmt += FIELDS[i][1]
+      values.append(value)
+  return SNAP_HEADER.pack(SNAPSHOT, seq, base_seq, ack, mask) + struct.pack(fmt, *values)
+
+
+# returns (seq, ack, snap), or None when the baseline is gone
+def decode(packet, history):
+  (_, seq, base_seq, ack, mask) = SNAP_HEADER.unpack_from(packet)
+  if base_seq:
+    base = history.get(base_seq)
+    if base is None:
+      return None
+  else:
+    base = (0,)*len(FIELDS)
+  fmt = "<" + "".join(f for (i, (_, f)) in enumerate(FIELDS) if mask & (1 << i))
+  values = iter(struct.unpack_from(fmt, packet, SNAP_HEADER.size))
+  snap = tuple(next(values) if mask & (1 << i) else base[i] for i in range(len(FIELDS)))
+  return (seq, ack, snap)
+
+
+"""
+  LossyLink:  sendto with simulated loss, delay and jitter, (seconds)
+
+  Delayed packets wait in a heap until flush() finds them due.
+"""
+class LossyLink:
+
+  def __init__(self, sock, loss=0.0, delay=0.0, jitter=0.0, rng=None, clock=time.perf_counter):
+    self.sock = sock
+    self.loss = loss
+    self.delay = delay
+    self.jitter = jitter
+    self.rng = rng if rng is not None else random.Random()
+    self.clock = clock
+    self.queue = []
+    self.count = 0
+    self.dropped = 0
+
+  def sendto(self, data, addr):
+    if self.loss and self.rng.random() < self.loss:
+      self.dropped += 1
+      return
+    if not (self.delay or self.jitter):
+      self.sock.sendto(data, addr)
+      return
+    due = self.clock() + self.delay + self.rng.uniform(0, self.jitter)
+    self.count += 1
+    heapq.heappush(self.queue, (due, self.count, data, addr))
+
+  def flush(self):
+    now = self.clock()
+    while self.queue and self.queue[0][0] <= now:
+      (_, _, data, addr) = heapq.heappop(self.queue)
+      self.sock.sendto(data, addr)
+
+
+def receive(sock):
+  while True:
+    try:
+      yield sock.recvfrom(2048)
+    except BlockingIOError:
+      return
+
+
+"""
+  NetStats:   traffic and latency for one end of the connection
+"""
+class NetStats:
+  MISSING_WINDOW = 1024
+
+  def __init__(self, clock=time.perf_counter):
+    self.clock = clock
+    self.start = clock()
+    self.sent = self.received = 0
+    self.bytes_sent = self.bytes_received = 0
+    # packets that never arrived, (gaps in the sequence), ones that came late
+    # and second copies
+    self.lost = self.late = self.duplicates = 0
+    self.last_seq = 0
+    # the seqs counted as lost, (the last MISSING_WINDOW), for when they turn up late
+    self.missing = set()
+    self.rtt = collections.deque(maxlen=300)
+
+  def on_send(self, n):
+    self.sent += 1
+    self.bytes_sent += n
+
+  def on_receive(self, n, seq):
+    self.received += 1
+    self.bytes_received += n
+    if seq > self.last_seq:
+      self.lost += seq - self.last_seq - 1
+      self.missing.update(range(max(self.last_seq + 1, seq - self.MISSING_WINDOW), seq))
+      self.last_seq = seq
+      if len(self.missing) > self.MISSING_WINDOW:
+        self.missing = {s for s in self.missing if s > seq - self.MISSING_WINDOW}
+    elif seq in self.missing:
+      # counted as lost when the gap was seen
+      self.missing.discard(seq)
+      self.lost -= 1
+      self.late += 1
+    else:
+      self.duplicates += 1
+
+  def summary(self):
+    secs = max(self.clock() - self.start, 1e-9)
+    rtt = sorted(self.rtt)
+    return {
+      "seconds": secs,
+      "kbps_up": 8*self.bytes_sent/secs/1000,
+      "kbps_down": 8*self.bytes_received/secs/1000,
+      "bytes_per_packet_up": self.bytes_sent/max(self.sent, 1),
+      "bytes_per_packet_down": self.bytes_received/max(self.received, 1),
+      "loss": self.lost/max(self.lost + self.received - self.duplicates, 1),
+      "late": self.late,
+      "duplicates": self.duplicates,
+      "rtt_ms_p50": 1000*rtt[len(rtt)//2] if rtt else None,
+      "rtt_ms_max": 1000*rtt[-1] if rtt else None,
+    }
+
+  def format(self):
+    s = self.summary()
+    rtt = f"{s['rtt_ms_p50']:.0f}/{s['rtt_ms_max']:.0f} ms" if s["rtt_ms_p50"] is not None else "-"
+    return (f"up {s['kbps_up']:.1f} kbps ({s['bytes_per_packet_up']:.0f} B/pkt), "
+            f"down {s['kbps_down']:.1f} kbps ({s['bytes_per_packet_down']:.0f} B/pkt), "
+            f"loss {100*s['loss']:.1f}%, rtt p50/max {rtt}")
+
+
+"""
+  RemoteInput:    the client's paddle, in place of the Joystick on the host
+
+  Inputs are applied in order, one per host tick.  When the next one hasn't
+  arrived the last one is repeated, and a backlog (the client running ahead)
+  is skipped down to a few ticks.
+"""
+class RemoteInput:
+  BACKLOG = 4
+
+  def __init__(self):
+    self.pending = {}
+    self.applied = 0
+    self.dv = (0, 0)
+    self.pressed = False
+
+  def add(self, seq, frame):
+    if seq > self.applied:
+      self.pending[seq] = frame
+
+  def step(self):
+    if self.pending and max(self.pending) - self.applied > self.BACKLOG:
+      newest = max(self.pending)
+      self.applied = newest - self.BACKLOG
+      self.pending = {s: f for (s, f) in self.pending.items() if s > self.applied}
+    frame = self.pending.pop(self.applied + 1, None)
+    if frame:
+      self.applied += 1
+      (dx, dy, pressed) = frame
+      self.dv = (dx, dy)
+      self.pressed = bool(pressed)
+
+  def get_dv(self, max_dv=6):
+    return self.dv
+
+  def get_pressed(self):
+    return self.pressed
+
+
+class NetHost:
+
+  def __init__(self, port=PORT, loss=0.0, delay=0.0, jitter=0.0, clock=time.perf_counter):
+    self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    self.sock.bind(("", port))
+    self.sock.setblocking(False)
+    self.link = LossyLink(self.sock, loss, delay, jitter, clock=clock)
+    self.stats = NetStats(clock)
+    self.remote = RemoteInput()
+    self.client = None
+    self.seq = 0
+    self.history = {}
+    self.acked = 0
+
+  # read the client's inputs, call before every state.update_state
+  def poll(self):
+    for (packet, addr) in receive(self.sock):
+      if len(packet) < INPUT_HEADER.size or packet[0] != INPUT:
+        continue
+      (_, ack, newest, count) = INPUT_HEADER.unpack_from(packet)
+      self.client = addr
+      self.stats.on_receive(len(packet), newest)
+      if ack > self.acked and ack in self.history:
+        self.acked = ack
+      for i in range(count):
+        frame = INPUT_FRAME.unpack_from(packet, INPUT_HEADER.size + i*INPUT_FRAME.size)
+        self.remote.add(newest - count + 1 + i, frame)
+    self.remote.step()
+
+  # snapshot the state to the client, call after every state.update_state
+  def send(self, state):
+    self.link.flush()
+    if self.client is None:
+      return
+    self.seq += 1
+    snap = snapshot(state)
+    self.history[self.seq] = snap
+    self.history.pop(self.seq - HISTORY, None)
+    base = self.history.get(self.acked)
+    packet = encode(self.seq, self.acked if base else 0, base, snap, self.remote.applied)
+    self.link.sendto(packet, self.client)
+    self.stats.on_send(len(packet))
+    self.link.flush()
+
+  def close(self):
+    self.sock.close()
+
+
+class NetClient:
+
+  def __init__(self, host, port=PORT, loss=0.0, delay=0.0, jitter=0.0, clock=time.perf_counter):
+    self.addr = (host, port)
+    self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    self.sock.setblocking(False)
+    self.clock = clock
+    self.link = LossyLink(self.sock, loss, delay, jitter, clock=clock)
+    self.stats = NetStats(clock)
+    # the client's copy of the game, what gets drawn
+    self.state = pong.State()
+    self.seq = 0
+    # the inputs the host hasn't acked, seqs first to seq, (at most HISTORY)
+    self.first = 1
+    self.inputs = {}
+    self.sent_at = {}
+    self.predicted = {}
+    self.snaps = {}
+    self.newest = 0
+    self.acked = 0
+    self.corrections = 0
+
+  """
+    tick:   send this tick's input and predict it, (dx, dy) and button for the right paddle
+  """
+  def tick(self, dv, pressed=False):
+    self.seq += 1
+    seq = self.seq
+    frame = (dv[0], dv[1], int(pressed))
+    self.inputs[seq] = frame
+    self.sent_at[seq] = self.clock()
+    # no acks for a while, (host gone, heavy loss), the oldest go, the host
+    # has skipped them anyway, see RemoteInput.BACKLOG
+    if seq - self.first >= HISTORY:
+      self.forget(self.first)
+    # the inputs the host has applied are gone already
+    first = max(seq - REDUNDANCY + 1, self.first)
+    packet = INPUT_HEADER.pack(INPUT, self.acked, seq, seq - first + 1)
+    packet += b"".join(INPUT_FRAME.pack(*self.inputs[s]) for s in range(first, seq + 1))
+    self.link.sendto(packet, self.addr)
+    self.stats.on_send(len(packet))
+    self.link.flush()
+
+    state = self.state
+    for obj in (state.ball, state.lpaddle, state.rpaddle):
+      obj.snapshot()
+    self.predict(dv)
+    self.predicted[seq] = (state.rpaddle.x, state.rpaddle.y)
+    self.extrapolate()
+
+  # drop the inputs up to seq, (acked or too old)
+  def forget(self, seq):
+    for s in range(self.first, seq + 1):
+      del self.inputs[s]
+      self.sent_at.pop(s, None)
+      self.predicted.pop(s, None)
+    self.first = max(self.first, seq + 1)
+
+  def predict(self, dv):
+    state = self.state
+    if state.state != state.STATE.BEGIN:
+      state.rpaddle.update(*dv)
+
+  # the ball one tick on, off the walls like Ball.update, (points and paddles are the host's)
+  def extrapolate(self):
+    state = self.state
+    if state.state != state.STATE.PLAY:
+      return
+    ball = state.ball
+    ball.x += ball.vx
+    ball.y += ball.vy
+    if ball.y <= ball.PADDING or ball.y >= pong.HEIGHT + ball.PADDING:
+      ball.vy = -ball.vy
+
+  """
+    poll:   apply the newest snapshot, and replay the ticks since, (the inputs
+            the host hasn't applied yet), the ball is moved on as many ticks
+  """
+  def poll(self):
+    newest = None
+    for (packet, _) in receive(self.sock):
+      if len(packet) < SNAP_HEADER.size or packet[0] != SNAPSHOT:
+        continue
+      decoded = decode(packet, self.snaps)
+      if decoded is None:
+        continue
+      (seq, ack, snap) = decoded
+      self.stats.on_receive(len(packet), seq)
+      self.keep(seq, snap)
+      if newest is None or seq > newest[0]:
+        newest = decoded
+    self.link.flush()
+    if newest is None or newest[0] <= self.acked:
+      return
+
+    (seq, ack, snap) = newest
+    self.acked = seq
+    apply(self.state, snap)
+    if ack in self.sent_at:
+      self.stats.rtt.append(self.clock() - self.sent_at[ack])
+    if self.predicted.get(ack, (snap[6], snap[7])) != (snap[6], snap[7]):
+      self.corrections += 1
+    self.forget(ack)
+    for s in range(self.first, self.seq + 1):
+      self.predict(self.inputs[s][:2])
+      self.extrapolate()
+
+  # a snapshot for delta baselines, only the last HISTORY seqs are kept, (with
+  # loss the one falling out of the window may never have arrived)
+  def keep(self, seq, snap):
+    if seq <= self.newest - HISTORY:
+      return
+    self.snaps[seq] = snap
+    if seq > self.newest:
+      self.newest = seq
+      if len(self.snaps) > HISTORY:
+        for s in [s for s in self.snaps if s <= seq - HISTORY]:
+          del self.snaps[s]
+
+  def close(self):
+    self.sock.close()
+
+
+# WASD for the client's paddle, when there's no joystick
+def keys_dv(keys, max_dv):
+  dx = (keys[pygame.K_d] - keys[pygame.K_a])*max_dv
+  dy = (keys[pygame.K_s] - keys[pygame.K_w])*max_dv
+  return (dx, dy)
+
+
+def play(args):
+  pygame.display.init()
+  pygame.font.init()
+  win = pygame.display.set_mode((pong.WIDTH, pong.HEIGHT))
+  pygame.display.set_caption("Pong (network)")
+  clock = pygame.time.Clock()
+  renderer = pong.PygameRenderer(win)
+
+  if args.host:
+    end = NetHost(args.port, args.loss, args.delay, args.jitter)
+    state = pong.State(end.remote)
+  else:
+    (host, _, port) = args.connect.partition(":")
+    end = NetClient(host, int(port or args.port), args.loss, args.delay, args.jitter)
+    state = end.state
+    joystick = pong.JoystickSampler(pong.Joystick()).start() if args.joystick else None
+
+  keys = Inputs()
+  running = True
+  while running:
+    clock.tick(FPS)
+    for event in pygame.event.get():
+      if event.type == pygame.QUIT:
+        running = False
+      keys.handle(event)
+    if keys[pygame.K_q]:
+      running = False
+
+    if args.host:
+      end.poll()
+      state.update_state(keys)
+      end.send(state)
+    else:
+      if joystick:
+        end.tick(joystick.get_dv(state.MAX_DV), joystick.get_pressed())
+      else:
+        end.tick(keys_dv(keys, state.MAX_DV))
+      end.poll()
+    keys.end_tick()
+    renderer.draw(state)
+
+  print(end.stats.format())
+  if not args.host and joystick:
+    joystick.stop()
+  end.close()
+  pygame.quit()
+
+
+"""
+  loopback:   host and client in one process, on a virtual clock
+
+  The client's paddle sweeps up and down, the host's left player stands
+  still.  Prints both ends' stats and how often the prediction was wrong.
+"""
+def loopback(args):
+  now = [0.0]
+  clock = lambda: now[0]
+  host = NetHost(args.port, args.loss, args.delay, args.jitter, clock)
+  state = pong.State(host.remote)
+  client = NetClient("127.0.0.1", args.port, args.loss, args.delay, args.jitter, clock)
+  keys = KeyState([pygame.K_SPACE])
+  max_dv = state.MAX_DV
+
+  t0 = time.perf_counter()
+  for tick in range(args.ticks):
+    now[0] = tick/FPS
+    client.tick((0, max_dv if (tick//90) % 2 else -max_dv))
+    host.poll()
+    state.update_state(keys)
+    keys.end_tick()
+    host.send(state)
+    client.poll()
+  secs = time.perf_counter() - t0
+
+  (hx, hy) = (state.rpaddle.x, state.rpaddle.y)
+  (cx, cy) = (client.state.rpaddle.x, client.state.rpaddle.y)
+  print(f"{args.ticks} ticks in {secs:.2f}s, score {state.score1}:{state.score2}")
+  print(f"host   {host.stats.format()}")
+  print(f"client {client.stats.format()}")
+  print(f"mispredicted snapshots {client.corrections}, paddle host ({hx}, {hy}) client ({cx}, {cy})")
+  host.close()
+  client.close()
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Two player pong over UDP")
+  mode = parser.add_mutually_exclusive_group(required=True)
+  mode.add_argument("--host", action="store_true", help="run the game, left paddle on [w,a,s,d]")
+  mode.add_argument("--connect", metavar="HOST[:PORT]", help="play the right paddle")
+  mode.add_argument("--loopback", action="store_true", help="host and client in one process, headless")
+  parser.add_argument("--port", type=int, default=PORT)
+  parser.add_argument("--joystick", action="store_true", help="client uses the joystick, not [w,a,s,d]")
+  parser.add_argument("--loss", type=float, default=0.0, help="fraction of packets dropped")
+  parser.add_argument("--delay", type=float, default=0.0, help="seconds added to every packet")
+  parser.add_argument("--jitter", type=float, default=0.0, help="up to this many more seconds")
+  parser.add_argument("--ticks", type=int, default=3000, help="loopback length")
+  args = parser.parse_args()
+  if args.loopback:
+    loopback(args)
+  else:
+    play(args)
+
+
+if __name__=="__main__":
+  main()
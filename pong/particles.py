@@ -0,0 +1,251 @@
+"""
+  Pooled particles, for paddle hits and points
+
+  Every particle lives in arrays allocated up front, (position, velocity,
+  age, lifetime, size, color), with a stack of free slots: a burst pops
+  slots off it and expired particles are pushed back, so there are no
+  particle objects and no growing or compacting.  update() is in place
+  NumPy ops into those arrays, a tick allocates no arrays however many
+  particles are alive.  draw() packs the live ones into scratch arrays
+  allocated up front too, (the gathers and arithmetic all go out= into
+  them), and blits them all from cached circles, (sprites.py), in one
+  Surface.blits fed by a generator, so no per particle list or Rect is kept.
+  It returns one Rect around them all for the dirty rects.
+
+  Colors are a small palette, a burst adds its color once, and the circle
+  surfaces are kept in a list indexed by palette entry and radius, sizes go
+  up to MAX_SIZE, (after the render scale too).
+
+  particles = Particles(4096)
+  particles.burst(x, y, 24, WHITE, vx=ball.vx, vy=ball.vy)
+  particles.update()                          # once per tick
+  rects = particles.draw(win, alpha)
+
+  NullParticles has the same methods and does nothing, (headless runs).
+
+  A burst with no free slots left only gets what's free, the oldest
+  particles aren't stolen.  Particles use their own NumPy Generator, so
+  they don't change a game's ball launches, (record/replay).
+
+"""
+
+import numpy as np
+import pygame
+from sprites import BallSprites
+
+
+class Particles:
+  # pixels per tick per tick, down
+  GRAVITY = 0.15
+  # velocity kept per tick
+  DRAG = 0.96
+  # largest starting radius, (the sprite list has MAX_SIZE + 1 radii per color)
+  MAX_SIZE = 8
+
+  def __init__(self, capacity=4096, rng=None):
+    self.capacity = capacity
+    self.rng = rng if rng is not None else np.random.default_rng()
+    self.sprites = BallSprites()
+    self.x = np.zeros(capacity)
+    self.y = np.zeros(capacity)
+    self.vx = np.zeros(capacity)
+    self.vy = np.zeros(capacity)
+    self.age = np.zeros(capacity)
+    self.life = np.ones(capacity)
+    # starting radius, shrinks to 1 over the particle's life
+    self.size = np.zeros(capacity)
+    # index into palette
+    self.color = np.zeros(capacity, dtype=np.int64)
+    self.palette = {}
+    self.colors = []
+    # circle surfaces, [palette index*(MAX_SIZE + 1) + radius], filled in on first use
+    self.surfaces = []
+    self.alive = np.zeros(capacity, dtype=bool)
+    self.dead = np.zeros(capacity, dtype=bool)
+    # free slots are free[:nfree], a stack
+    self.slots = np.arange(capacity)
+    self.free = self.slots[::-1].copy()
+    self.nfree = capacity
+    # scratch for draw(), the live particles packed together
+    self.dx = np.zeros(capacity)
+    self.dy = np.zeros(capacity)
+    self.dr = np.zeros(capacity)
+    self.dt = np.zeros(capacity)
+    self.left = np.zeros(capacity, dtype=np.int64)
+    self.top = np.zeros(capacity, dtype=np.int64)
+    self.radius = np.zeros(capacity, dtype=np.int64)
+    self.sprite = np.zeros(capacity, dtype=np.int64)
+    # for pack(), int64 so cumsum and the arithmetic don't cast through buffers
+    self.mask = np.zeros(capacity, dtype=np.int64)
+    self.pos = np.zeros(capacity, dtype=np.int64)
+    self.live = np.zeros(capacity + 1, dtype=np.int64)
+
+  def __len__(self):
+    return self.capacity - self.nfree
+
+  """
+    burst:    n particles out of each (x, y), scalars or arrays of origins
+
+    speed:    pixels per tick, random up to this in every direction
+    life:     ticks, +-30% random
+    size:     starting radius, up to MAX_SIZE
+    vx, vy:   added at half strength, so the burst follows the ball
+  """
+  def burst(self, x, y, n, color, speed=5.0, life=30, size=4, vx=0.0, vy=0.0):
+    x = np.repeat(np.atleast_1d(x), n)
+    y = np.repeat(np.atleast_1d(y), n)
+    k = min(len(x), self.nfree)
+    if k == 0:
+      return
+    self.nfree -= k
+    slots = self.free[self.nfree:self.nfree + k]
+
+    rng = self.rng
+    angle = rng.uniform(0, 2*np.pi, k)
+    v = speed*np.sqrt(rng.random(k))
+    self.x[slots] = x[:k]
+    self.y[slots] = y[:k]
+    self.vx[slots] = v*np.cos(angle) + 0.5*vx
+    self.vy[slots] = v*np.sin(angle) + 0.5*vy
+    self.age[slots] = 0
+    self.life[slots] = life*rng.uniform(0.7, 1.3, k)
+    self.size[slots] = min(size, self.MAX_SIZE)
+    self.color[slots] = self.palette_index(color)
+    self.alive[slots] = True
+
+  # one tick, move, age and free the expired
+  def update(self):
+    (vx, vy) = (self.vx, self.vy)
+    # dead slots move too, it's cheaper than masking
+    self.x += vx
+    self.y += vy
+    vy += self.GRAVITY
+    vx *= self.DRAG
+    vy *= self.DRAG
+    self.age += 1
+
+    dead = np.greater_equal(self.age, self.life, out=self.dead)
+    dead &= self.alive
+    k = np.count_nonzero(dead)
+    if k:
+      np.compress(dead, self.slots, out=self.free[self.nfree:self.nfree + k])
+      self.nfree += k
+      # (dead is a subset of alive)
+      np.logical_xor(self.alive, dead, out=self.alive)
+
+  def palette_index(self, color):
+    color = tuple(color)
+    i = self.palette.get(color)
+    if i is None:
+      i = self.palette[color] = len(self.colors)
+      self.colors.append(color)
+      self.surfaces.extend([None]*(self.MAX_SIZE + 1))
+    return i
+
+  """
+    pack:   the live slots, in live[:len(self)]
+
+    np.compress would do it in one call but allocates its index arrays every
+    frame, this is all in place: each live slot goes to (live slots before
+    it), the dead ones to the spare entry at the end.
+  """
+  def pack(self):
+    (pos, mask) = (self.pos, self.mask)
+    np.copyto(mask, self.alive)
+    np.cumsum(mask, out=pos)
+    pos -= 1 + self.capacity
+    pos *= mask
+    pos += self.capacity
+    np.put(self.live, pos, self.slots, mode="clip")
+    return self.live
+
+  # the circle for surfaces[k], drawn by sprites the first time
+  def surface(self, k, sprites):
+    (i, r) = divmod(int(k), self.MAX_SIZE + 1)
+    surface = self.surfaces[k] = sprites.get(r, self.colors[i])
+    return surface
+
+  def clear(self):
+    self.alive[:] = False
+    self.free[:] = self.slots[::-1]
+    self.nfree = self.capacity
+
+  """
+    draw:   the live particles, returns [one Rect around them], ([] for none)
+
+    alpha interpolates back from the last tick like the balls, sprites is a
+    BallSprites to draw new circles with, scale is the render target's,
+    (scaling.py).
+  """
+  def draw(self, win, alpha=1.0, sprites=None, scale=1.0):
+    n = self.capacity - self.nfree
+    if n == 0:
+      return []
+    if sprites is None:
+      sprites = self.sprites
+    live = self.pack()[:n]
+    (x, y, r, t) = (self.dx[:n], self.dy[:n], self.dr[:n], self.dt[:n])
+    np.take(self.x, live, out=x, mode="clip")
+    np.take(self.y, live, out=y, mode="clip")
+    # back to where it was alpha into the tick
+    np.take(self.vx, live, out=t, mode="clip")
+    t *= 1 - alpha
+    x -= t
+    np.take(self.vy, live, out=t, mode="clip")
+    t *= 1 - alpha
+    y -= t
+    x *= scale
+    y *= scale
+
+    # radius from size down to 1 over the particle's life, size - (size - 1)*age/life
+    np.take(self.age, live, out=r, mode="clip")
+    np.take(self.life, live, out=t, mode="clip")
+    r /= t
+    np.take(self.size, live, out=t, mode="clip")
+    t -= 1
+    r *= t
+    t += 1
+    np.subtract(t, r, out=r)
+    r *= scale
+    # 1 to MAX_SIZE, (a render scale above 1 would run past the sprite list)
+    np.clip(r, 1, self.MAX_SIZE, out=r)
+
+    # whole pixels, truncated like draw.circle
+    (left, top, radius, sprite) = (self.left[:n], self.top[:n], self.radius[:n], self.sprite[:n])
+    np.copyto(radius, r, casting="unsafe")
+    np.copyto(left, x, casting="unsafe")
+    left -= radius
+    np.copyto(top, y, casting="unsafe")
+    top -= radius
+    np.take(self.color, live, out=sprite, mode="clip")
+    sprite *= self.MAX_SIZE + 1
+    sprite += radius
+
+    surfaces = self.surfaces
+    # (memoryviews iterate as plain ints, quicker than NumPy scalars)
+    items = zip(memoryview(sprite), memoryview(left), memoryview(top))
+    win.blits(((surfaces[k] or self.surface(k, sprites), (l, t)) for (k, l, t) in items), doreturn=False)
+
+    # one Rect around them all, (a Rect each would be more than DirtyRects flips)
+    d = 2*int(radius.max())
+    (x0, y0) = (int(left.min()), int(top.min()))
+    (x1, y1) = (int(left.max()) + d, int(top.max()) + d)
+    return [pygame.Rect(x0, y0, x1 - x0, y1 - y0).clip(win.get_rect())]
+
+
+class NullParticles:
+
+  def __len__(self):
+    return 0
+
+  def burst(self, x, y, n, color, speed=5.0, life=30, size=4, vx=0.0, vy=0.0):
+    pass
+
+  def update(self):
+    pass
+
+  def clear(self):
+    pass
+
+  def draw(self, win, alpha=1.0, sprites=None, scale=1.0):
+    return []
@@ -13,19 +13,34 @@
 
 import pygame
 import random
+import sys
 import time
 from enum import Enum
 from gpiozero import Button, MCP3008
-pygame.init()
-pygame.mixer.init()
+from render import Renderer, NullRenderer, KeyState
+from inputs import Inputs
+from dirty import DirtyRects
+from textcache import TextCache
+from layers import Compositor, midline
+from loop import FixedStep, lerp
+from sampler import JoystickSampler
+from profiler import FrameProfiler, NullProfiler
+from latency import LatencyTracer, NullTracer
+from sweep import sweep_circle_aabb
+from replay import InputRecorder
+from assets import Assets, FONT_INDEX
+from sprites import BallSprites
+from ai import PaddleAI
+from scaling import RenderTarget, BUDGET, options
+from particles import Particles, NullParticles
 
 WIDTH, HEIGHT = 1200,600
-WIN = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Pong")
 
 
 # throttle the FPS 
 FPS = 60
+# physics ticks per second, independent of the render FPS
+TICK_RATE = 60
 
 
 # Some colors 
@@ -48,6 +63,10 @@ class Joystick:
 
   def get_pressed(self):
     return self.button.is_pressed
+
+  # raw axes (0 to 1) and button, one read of everything for JoystickSampler
+  def read(self):
+    return (self.Vx.value, self.Vy.value, self.button.is_pressed)
   
   """
     get_dv:     returns (dvx, dvy) in world coordinates, (x: left to right, y: top to bottom)
@@ -70,24 +89,34 @@ class Ball:
   SCALE = 40    # arbitrary, used to implement the "pong" style momentum transfer
   PADDING = 10  #
 
-  def __init__(self, x, y, radius):
+  # rng: random.Random for the launch velocities, a seeded one makes a game repeatable
+  def __init__(self, x, y, radius, rng=None):
     self.x = x
     self.y = y
+    self.rng = rng if rng is not None else random
     self.launch()
     self.radius = radius
+    self.snapshot()
+
+  # remember the position at the start of a tick, for render interpolation
+  def snapshot(self):
+    self.px = self.x
+    self.py = self.y
 
   def launch(self, right=True):
     if right:
-      self.vx = random.randint(3,6)
+      self.vx = self.rng.randint(3,6)
     else: 
-      self.vx = random.randint(-6,-3)
-    self.vy = random.randint(-6,6)
+      self.vx = self.rng.randint(-6,-3)
+    self.vy = self.rng.randint(-6,6)
     
 
   def reset(self, right=True):
     self.x = WIDTH//2
     self.y = HEIGHT//2
     self.launch(right)
+    # no interpolating across the jump back to the center
+    self.snapshot()
 
   def update(self):
     self.x += self.vx
@@ -110,73 +139,128 @@ class Ball:
 
     return None
   
+  # "pong" style momentum transfer off the front face of a paddle
+  def bounce(self, paddle):
+    self.vx= -self.vx
+    # should be in range (-1,1)
+    dy_ball = (self.y - (paddle.y + paddle.height//2))
+    # ball is on upper part of paddle, dvy is negative, else positive
+    dvy = self.SCALE * (dy_ball) / paddle.height//2        
+    self.vy += dvy
+    # boost speed, (away from the paddle)
+    if abs(self.vy) > self.vMAX:
+      self.vx += 2 if self.vx > 0 else -2
+
+    # Now make sure that |vy| is not greater than |vMAX|
+    if self.vy <= 0:
+      self.vy = int(max(self.vy, -self.vMAX))
+    else:
+      self.vy = int(min(self.vy, self.vMAX))
+
+  # top of a paddle
+  def bounce_up(self):
+    if self.vy == 0:
+      self.vy = -2
+    elif self.vy > 0:
+      self.vy = -self.vy
+
+  # bottom of a paddle
+  def bounce_down(self):
+    if self.vy == 0:
+      self.vy = 2
+    elif self.vy < 0:
+      self.vy = -self.vy
+
+  """
+    sweep:    swept collision of this step, (px, py) -> (x, y), against the paddles
+
+    A fast ball can move further than a paddle is wide in one step, the discrete
+    checks below would miss it.  On a hit the ball goes back to the point of
+    contact and bounces by the same rules.  Returns True on a hit.
+  """
+  def sweep(self, lpaddle, rpaddle):
+    dx = self.x - self.px
+    dy = self.y - self.py
+    if dx == 0 and dy == 0:
+      return False
+
+    first = None
+    for paddle in [lpaddle, rpaddle]:
+      box = (paddle.x, paddle.y, paddle.x + paddle.width, paddle.y + paddle.height)
+      hit = sweep_circle_aabb(self.px, self.py, dx, dy, self.radius, box)
+      if hit and (first is None or hit[0] < first[1][0]):
+        first = (paddle, hit)
+    if first is None:
+      return False
+
+    (paddle, (t, nx, ny)) = first
+    side = abs(nx) >= abs(ny)
+    # only the faces towards the middle, same as the discrete checks, the
+    # ball passes through the back of a paddle
+    if side and not ((paddle.type == Paddle.TYPE.RIGHT and nx < 0) or (paddle.type == Paddle.TYPE.LEFT and nx > 0)):
+      return False
+    # back to the point of contact first, bounce() deflects by where on the
+    # paddle it hit
+    self.x = self.px + t*dx
+    self.y = self.py + t*dy
+    if side:
+      self.bounce(paddle)
+    elif ny < 0:
+      self.bounce_up()
+    else:
+      self.bounce_down()
+    return True
+
   # Collisions - if ball is moving right and hits left side of paddle
+  # returns True when the ball bounced off a paddle
   def check_collision(self, lpaddle, rpaddle):
-    score = 0
+    hit = False
+
+    # continuous check first, so fast balls don't tunnel through
+    if self.sweep(lpaddle, rpaddle):
+      return True
 
     # check left side, (right paddle)
     if ( self.x <= rpaddle.x ) and (self.x + self.radius >= rpaddle.x ):
       if (self.y >= rpaddle.y) and (self.y <= rpaddle.y + rpaddle.height):
         # Left side collision, only implement when coming from left
         if self.vx > 0:
-          self.vx= -self.vx
-          # should be in range (-1,1)
-          dy_ball = (self.y - (rpaddle.y + rpaddle.height//2))
-          # ball is on upper part of paddle, dvy is negative, else positive
-          dvy = self.SCALE * (dy_ball) / rpaddle.height//2        
-          self.vy += dvy
-          # boost speed
-          if abs(self.vy) > self.vMAX:
-            self.vx-=2
-
-          # Now make sure that |vy| is not greater than |vMAX|
-          if self.vy <= 0:
-            self.vy = int(max(self.vy, -self.vMAX))
-          else:
-            self.vy = int(min(self.vy, self.vMAX))
+          self.bounce(rpaddle)
+          hit = True
 
     # Check right side, (left paddle)
     if ( self.x >= lpaddle.x + lpaddle.width ) and (self.x <= lpaddle.x + lpaddle.width + self.radius):
       if (self.y > lpaddle.y) and (self.y < lpaddle.y + lpaddle.height):
         # Right side collision, only implement when coming from right
         if self.vx < 0:
-          self.vx= -self.vx
-          # should be in range (-1,1)
-          dy_ball = (self.y - (lpaddle.y + lpaddle.height//2))
-          # ball is on upper part of paddle, dvy is negative, else positive
-          dvy = self.SCALE * (dy_ball) / lpaddle.height//2        
-          self.vy += dvy
-          # boost speed
-          if abs(self.vy) > self.vMAX:
-            self.vx+=2
-
-          # Now make sure that |vy| is not greater than |vMAX|
-          if self.vy <= 0:
-            self.vy = int(max(self.vy, -self.vMAX))
-          else:
-            self.vy = int(min(self.vy, self.vMAX))
+          self.bounce(lpaddle)
+          hit = True
     
     # check top and bottom
     for paddle in [lpaddle, rpaddle]:
       if (self.x >= paddle.x) and (self.x <= paddle.x+paddle.width):
         # vertical side
         if (self.y <= paddle.y) and (self.y >= paddle.y - self.radius):
-          if self.vy == 0:
-            self.vy = -2
-          elif self.vy > 0:
-            self.vy = -self.vy
+          self.bounce_up()
+          hit = True
 
         # bottom side
         if (self.y >= paddle.y + paddle.height) and (self.y <= paddle.y + paddle.height + self.radius):
-          if self.vy == 0:
-            self.vy = 2
-          elif self.vy < 0:
-            self.vy = -self.vy
+          self.bounce_down()
+          hit = True
+
+    return hit
 
     
 
-  def draw(self, win):
-    pygame.draw.circle(win, self.COLOR, (self.x, self.y), self.radius)
+  # sprites: BallSprites to blit from instead of drawing the circle
+  # scale: of the render target, see scaling.py
+  def draw(self, win, alpha=1.0, sprites=None, scale=1.0):
+    pos = (lerp(self.px, self.x, alpha)*scale, lerp(self.py, self.y, alpha)*scale)
+    r = max(1, round(self.radius*scale))
+    if sprites is not None:
+      return sprites.blit(win, pos, r, self.COLOR)
+    return pygame.draw.circle(win, self.COLOR, pos, r)
     #pygame.draw.rect(win, self.COLOR, (self.x, self.y, RADIUS, RADIUS))
   
 class Paddle:
@@ -196,6 +280,12 @@ class Paddle:
       self.type = self.TYPE.LEFT
     else: 
       self.type = self.TYPE.RIGHT
+    self.snapshot()
+
+  # remember the position at the start of a tick, for render interpolation
+  def snapshot(self):
+    self.px = self.x
+    self.py = self.y
     
   def update(self, dx, dy):
 
@@ -227,8 +317,10 @@ class Paddle:
         self.x = WIDTH//2 - self.width - self.width//2
   
 
-  def draw(self, win):
-    pygame.draw.rect(win, self.COLOR, (self.x, self.y, self.width, self.height))
+  def draw(self, win, alpha=1.0, scale=1.0):
+    x = lerp(self.px, self.x, alpha)
+    y = lerp(self.py, self.y, alpha)
+    return pygame.draw.rect(win, self.COLOR, (x*scale, y*scale, self.width*scale, self.height*scale))
 
 
 
@@ -236,7 +328,7 @@ class Paddle:
 """
   State Manager Class
 
-  Manages state updates and transitions, and rendering
+  Manages state updates and transitions, drawing is done by a Renderer
 
   Note, this class has become a jumbled spaghetti code monster and if I cared
   about keeping and reusing this code baaase I'd refactor this monstrosity
@@ -249,22 +341,10 @@ class State:
   # global counter
   time_ctx = 0
   ball_ctx = 0
-  btn_ctx = 0
 
   # Paddle max DX
   MAX_DV = 6  ## corresponds to 6 pixels per frame, ~ 350 pixels per second 
 
-  # music / sound
-  music = True
-  sound = pygame.mixer.Sound("wav/smartguy.wav")
-  
-  # Fonts used for text displays
-  BIG_FONT = pygame.font.SysFont("NotoSansMono-Bold",120)
-  MEDIUM_FONT = pygame.font.SysFont("NotoSansMono-Bold",50)
-  SMALL_FONT = pygame.font.SysFont("NotoSansMono-Bold",35)
-  
-  fps_text = None
-  
 
   # Primary state
   class STATE(Enum):
@@ -273,21 +353,36 @@ class State:
     WAIT = 3
     END = 4
 
-  def __init__(self):
+  """
+    joystick:   drives the right paddle, None leaves it where it is (headless runs)
+    sound:      background music, (Music or a Sound), None runs silent
+    profiler:   FrameProfiler for per-phase frame times and FPS, see profiler.py
+    rng:        random.Random for the ball launches, seeded for record/replay, see replay.py
+    tracer:     LatencyTracer for input to display.update latency, see latency.py
+    particles:  Particles for the paddle hit and point bursts, see particles.py
+  """
+  def __init__(self, joystick=None, sound=None, profiler=None, rng=None, tracer=None, particles=None):
     self.lpaddle = Paddle(20, HEIGHT//2 - 100, 30, 200, True)
     self.rpaddle = Paddle(WIDTH - 20 - 30, HEIGHT//2 - 100, 30, 200, False)
 
     # This launches ball, but ball doesn't begin to move/render until PLAY state
-    self.ball = Ball(WIDTH//2, HEIGHT//2, RADIUS)
+    self.ball = Ball(WIDTH//2, HEIGHT//2, RADIUS, rng)
     # Set direction of ball launch, initially to player 2
     self.launch_right = True
-    self.joystick = Joystick()
+    self.joystick = joystick
+    self.sound = sound
+    self.music = sound is not None
+    # practice mode, [p] at the start, puts the computer on the right paddle
+    self.ai = PaddleAI(self.ball, self.rpaddle, Ball.PADDING, HEIGHT + Ball.PADDING, HEIGHT//2,
+                       rng=self.ball.rng)
     self.state = self.STATE.BEGIN
     self.score1 = 0
     self.score2 = 0
     self.animate = True
     self.practice = False
-    self.seconds = time.time()
+    self.profiler = profiler if profiler is not None else NullProfiler()
+    self.tracer = tracer if tracer is not None else NullTracer()
+    self.particles = particles if particles is not None else NullParticles()
     
 
   """
@@ -299,16 +394,11 @@ class State:
   def update_state(self, keys):
     
     # Always do
-    self.btn_ctx +=1
     self.time_ctx +=1
-
-    # Update/calculate FPS every 60 frames
-    if self.time_ctx % 60 == 0:
-      t2 = time.time()
-      dt = t2 - self.seconds
-      self.seconds = t2
-      fps = int(60/dt)
-      self.fps_text = self.SMALL_FONT.render(f"FPS: {fps}", 1, WHITE)
+    for obj in (self.ball, self.lpaddle, self.rpaddle):
+      obj.snapshot()
+    # bursts play out whatever the state
+    self.particles.update()
 
 
     # BEGIN State:
@@ -319,14 +409,13 @@ class State:
         self.update_paddles(keys)
       if (keys[pygame.K_SPACE]):
         self.state = self.STATE.PLAY
-        if self.music: 
+        if self.music and self.sound:
           self.sound.play(loops=10)
         
         
-    # toggle music
-    if (keys[pygame.K_m] and self.btn_ctx>12):
+    # toggle music, once per press of [m], see inputs.py
+    if (keys.went_down(pygame.K_m) and self.sound):
       self.music = not self.music
-      self.btn_ctx = 0
       if not self.music and (self.STATE.PLAY or self.STATE.WAIT):
         self.sound.stop()
       if self.music and (self.STATE.PLAY or self.STATE.WAIT):
@@ -338,14 +427,19 @@ class State:
       self.update_paddles(keys)
       
       # Update Score / State
+      # (where the ball goes out, update() puts it back in the middle)
+      out_y = self.ball.y + self.ball.vy
       score = self.ball.update()
+      self.profiler.lap("physics")
       if score:
         if score[0]:
           self.score1 += score[0]
           self.launch_right=True
+          self.particles.burst(WIDTH, out_y, 80, WHITE, speed=9, life=45, vx=-12)
         elif score[1]:
           self.score2 += score[1]
           self.launch_right=False
+          self.particles.burst(0, out_y, 80, WHITE, speed=9, life=45, vx=12)
         
         if max(self.score1, self.score2) >= 10:
           self.state = self.STATE.END
@@ -354,7 +448,10 @@ class State:
           self.state = self.STATE.WAIT
           self.ball_ctx=0
       else:
-        self.ball.check_collision(self.lpaddle, self.rpaddle)
+        if self.ball.check_collision(self.lpaddle, self.rpaddle):
+          ball = self.ball
+          self.particles.burst(ball.x, ball.y, 24, WHITE, vx=ball.vx, vy=ball.vy)
+        self.profiler.lap("collisions")
 
     # WAIT state, launch new ball towards previous scorer
     if self.state == self.STATE.WAIT:
@@ -377,10 +474,20 @@ class State:
         # reset game state...
         # self.reset_game()
 
+    self.profiler.lap("physics")
+    self.tracer.mark("physics")
+
   def update_paddles(self, keys):
+    # Computer player
+    if self.practice:
+      (dx, dy) = self.ai.get_dv(self.MAX_DV)
+      self.rpaddle.update(dx,dy)
     # Check user inputs
-    (dx, dy) = self.joystick.get_dv(self.MAX_DV)
-    self.rpaddle.update(dx,dy)
+    elif self.joystick:
+      self.profiler.lap("physics")
+      (dx, dy) = self.joystick.get_dv(self.MAX_DV)
+      self.profiler.lap("joystick")
+      self.rpaddle.update(dx,dy)
 
     # Check user inputs for player 1
     # Movement Keys - [w,a,s,d]
@@ -392,72 +499,235 @@ class State:
       self.lpaddle.update(0,self.MAX_DV)
     if(keys[pygame.K_d]):   # RIGHT 
       self.lpaddle.update(self.MAX_DV,0)
-  
 
-  def draw(self, win):
-    # Draw any canvas details
-    win.fill(self.bg)
-    
-    # draw the fps
-    if self.fps_text:
-      win.blit(self.fps_text, (10, 50))
+    # the joystick's sample, or the keys when the computer has the right paddle
+    self.tracer.begin(None if self.practice else self.joystick, keys)
+
+
+"""
+  Pygame Renderer
+
+  The original State.draw, fonts are loaded here so the State can run without
+  a display.  Only the rects that changed are flipped, see dirty.py
+
+  The ball, paddles and background go into target, (the window, or a smaller
+  surface scaled up to it, see scaling.py), the text goes on the window.
+"""
+class PygameRenderer(Renderer):
+
+  def __init__(self, win, assets=None, target=None):
+    self.win = win
+    self.target = target if target is not None else RenderTarget(win, (WIDTH, HEIGHT))
+    if assets is None:
+      assets = Assets()
+    # Fonts used for text displays
+    self.BIG_FONT = assets.font("NotoSansMono-Bold",120)
+    self.MEDIUM_FONT = assets.font("NotoSansMono-Bold",50)
+    self.SMALL_FONT = assets.font("NotoSansMono-Bold",35)
+    # the BEGIN/END banner line is at (10, 90), the profiler overlay goes under it
+    self.overlay_pos = (10, 90 + self.MEDIUM_FONT.get_linesize())
+    self.rects = DirtyRects()
+    # scores, fps and banners only get rendered when they change
+    self.text = TextCache()
+    # background color and mid line, baked into one surface
+    self.layers = Compositor(win.get_size())
+    # the ball is blitted from a pre-drawn circle
+    self.sprites = BallSprites()
+
+  def draw(self, state, alpha=1.0):
+    t0 = time.perf_counter()
+    win = self.win
+    target = self.target
+    canvas = target.surface
+    s = target.scale
+    rects = self.rects
+    text = self.text.render
+    # Draw any canvas details, (erases what was drawn last frame)
+    rects.begin(canvas, self.layers.background(state.bg, (midline,), canvas.get_size()))
+
+    # Draw game objects
+    if state.state == state.STATE.PLAY:
+        rects.add(state.ball.draw(canvas, alpha, self.sprites, s))
+        
+    rects.add(state.lpaddle.draw(canvas, alpha, s))
+    rects.add(state.rpaddle.draw(canvas, alpha, s))
+    rects.extend(state.particles.draw(canvas, alpha, self.sprites, s))
+
+    # up to the window, the text goes on top at full resolution
+    target.present()
+    hud = []
+    # draw the fps, and the per-phase overlay when profiling
+    if state.profiler.fps:
+      hud.append(win.blit(text(self.SMALL_FONT, f"FPS: {state.profiler.fps}", WHITE), (10, 50)))
+    hud.extend(state.profiler.draw(win, self.SMALL_FONT, self.text, self.overlay_pos))
     # draw scores
-    win.blit(self.SMALL_FONT.render(f"Player1    {self.score1}", 1, WHITE), (10, 10))
-    win.blit(self.SMALL_FONT.render(f"Player2    {self.score2}", 1, WHITE), (WIDTH - 160, 10))
+    hud.append(win.blit(text(self.SMALL_FONT, f"Player1    {state.score1}", WHITE), (10, 10)))
+    hud.append(win.blit(text(self.SMALL_FONT, f"Player2    {state.score2}", WHITE), (WIDTH - 160, 10)))
     
-    if (self.state == self.STATE.BEGIN):
-      win.blit(self.MEDIUM_FONT.render("Press [spacebar] to Start", 1, WHITE), (10, 90))
+    if (state.state == state.STATE.BEGIN):
+      hud.append(win.blit(text(self.MEDIUM_FONT, "Press [spacebar] to Start", WHITE), (10, 90)))
       
     # animate blinking blit for end game
-    if (self.state == self.STATE.END):
-      if self.animate:
-        win.blit(self.BIG_FONT.render("GAME    OVER", 1, WHITE), (WIDTH//4,HEIGHT//3))
-      win.blit(self.MEDIUM_FONT.render("Press [spacebar] to Play Again", 1, WHITE), (10, 90))
-      
-      
-    
+    if (state.state == state.STATE.END):
+      if state.animate:
+        hud.append(win.blit(text(self.BIG_FONT, "GAME    OVER", WHITE), (WIDTH//4,HEIGHT//3)))
+      hud.append(win.blit(text(self.MEDIUM_FONT, "Press [spacebar] to Play Again", WHITE), (10, 90)))
+    # scaled, the whole window is redrawn every frame
+    if target.native:
+      rects.extend(hud)
+    state.profiler.lap("draw")
+    state.tracer.mark("draw")
+
+    rects.end(full=not target.native)
+    state.profiler.lap("flip")
+    state.tracer.flip()
+    # the next frame starts over at the new scale
+    if target.adapt(1000*(time.perf_counter() - t0)):
+      rects.invalidate()
+
+
+"""
+  Headless simulation
+
+  Steps the state machine as fast as possible, no display, no GPIO and no
+  clock.tick(FPS).  Used to tune Ball.vMAX, Ball.SCALE, State.MAX_DV etc.
+  A game that reaches END is scored and a new one started straight away,
+  so all the frames are rallies, (END would otherwise wait for [spacebar]).
   
-    # Draw game objects
-    
-    start_y, len_y = 20, 20
-    while(start_y < HEIGHT):
-      pygame.draw.line(win, WHITE, (WIDTH//2-5, start_y), (WIDTH//2-5, start_y + len_y), 10)
-      start_y += 2*len_y
-      
-    if self.state == self.STATE.PLAY:
-        self.ball.draw(win)
-        
-    self.lpaddle.draw(win)
-    self.rpaddle.draw(win)
+  keys:       KeyState held every frame
+  renderer:   defaults to NullRenderer
+  returns (frames, seconds, games, points), games counts the finished ones
+"""
+def simulate(state, frames, keys=None, renderer=None):
+  if keys is None:
+    keys = KeyState()
+  if renderer is None:
+    renderer = NullRenderer()
+  (games, points) = (0, 0)
+  t0 = time.perf_counter()
+  for _ in range(frames):
+    state.update_state(keys)
+    keys.end_tick()
+    renderer.draw(state)
+    if state.state == state.STATE.END:
+      games += 1
+      points += state.score1 + state.score2
+      (state.score1, state.score2) = (0, 0)
+      state.ball.reset()
+      state.state = state.STATE.PLAY
+  points += state.score1 + state.score2
+  return (frames, time.perf_counter() - t0, games, points)
 
-    pygame.display.update()
 
 # main program control loop
 def main():
   run = True
+  # --scale S [--fixed-scale] draws the game at S times the window size, see scaling.py
+  (scale, adaptive) = options(sys.argv)
+  # only the pygame modules we use, fonts through the index cached on disk, see assets.py
+  assets = Assets(FONT_INDEX)
+  assets.init("display", "font", "mixer")
+  with assets.timed("set_mode"):
+    win = pygame.display.set_mode((WIDTH, HEIGHT))
+  pygame.display.set_caption("Pong")
   clock = pygame.time.Clock()
-  state = State()
+  # joystick is read on its own thread, the loop never waits on SPI
+  stick = Joystick()
+  joystick = JoystickSampler(stick).start()
+  # keys come from the event queue, the joystick button starts a game like [spacebar]
+  keys = Inputs()
+  keys.watch(stick.button, pygame.K_SPACE)
+  # --profile shows the per-phase overlay, profile.json is written on exit either way
+  prof = FrameProfiler()
+  prof.overlay = "--profile" in sys.argv
+  # --latency [pin] traces input to display.update, pin mirrors the button at flip time
+  tracer = LatencyTracer(pin=latency_pin()) if "--latency" in sys.argv else None
+  # --record [path] logs the seed and every tick's input for replay.py
+  recorder = None
+  rng = None
+  inputs = joystick
+  if "--record" in sys.argv:
+    seed = random.randrange(2**32)
+    rng = random.Random(seed)
+    inputs = recorder = InputRecorder(joystick, seed, State.MAX_DV)
+  # the music streams from disk, see music.py
+  state = State(inputs, assets.music("wav/smartguy.wav"), prof, rng, tracer, Particles(4096))
+  target = RenderTarget(win, (WIDTH, HEIGHT), scale, BUDGET*1000/FPS if adaptive else None)
+  renderer = PygameRenderer(win, assets, target)
+  renderer.draw(state)
+  assets.mark("first frame")
+  print(assets.report())
+  steps = FixedStep(TICK_RATE)
   
   while run:
     clock.tick(FPS)
+    prof.lap("tick")
 
-    # process events
+    # process events, key and button changes update keys
     for event in pygame.event.get():
       if event.type == pygame.QUIT:
         run = False
         break
+      keys.handle(event)
+    prof.lap("events")
     
-    keys = pygame.key.get_pressed()
+    state.tracer.keys()
+    prof.lap("keys")
     if (keys[pygame.K_q]):
       run = False
       break
 
-    # Update game states and redraw
-    state.update_state(keys)
-    state.draw(WIN)
-
+    # Update game states at the fixed tick rate, redraw in between ticks
+    for _ in range(steps.advance()):
+      state.update_state(recorder.step(keys) if recorder else keys)
+      keys.end_tick()
+    renderer.draw(state, steps.alpha)
+    prof.end_frame()
+
+  prof.dump("profile.json")
+  if recorder:
+    recorder.save(record_path(), state)
+  if tracer:
+    print(tracer.format())
+    tracer.dump("latency.json")
+    tracer.close()
+  joystick.stop()
+  renderer.close()
   pygame.quit()
 
 
+# python pong.py --record [path], defaults to match.rec
+def record_path():
+  i = sys.argv.index("--record")
+  if i + 1 < len(sys.argv) and not sys.argv[i + 1].startswith("--"):
+    return sys.argv[i + 1]
+  return "match.rec"
+
+
+# python pong.py --latency [pin], the GPIO is optional
+def latency_pin():
+  i = sys.argv.index("--latency")
+  if i + 1 < len(sys.argv) and sys.argv[i + 1].isdigit():
+    return int(sys.argv[i + 1])
+  return None
+
+
+# python pong.py --headless [frames]
+def headless(frames):
+  state = State()
+  state.state = State.STATE.PLAY
+  # the computer on the right paddle, so the ball doesn't settle into one
+  # flat rally between two paddles that never move
+  state.practice = True
+  (n, dt, games, points) = simulate(state, frames)
+  rate = f"{n/dt:.0f}" if dt > 0 else "-"
+  print(f"{n} frames in {dt:.3f}s, {rate} frames/sec, {games} games, {points} points, "
+        f"score {state.score1}:{state.score2}")
+
+
 if __name__=="__main__":
-  main()
+  if "--headless" in sys.argv:
+    args = [a for a in sys.argv[1:] if a != "--headless"]
+    headless(int(args[0]) if args else 100000)
+  else:
+    main()
@@ -0,0 +1,169 @@
+"""
+  Per-phase frame profiler
+
+  Replaces the old "FPS every 60 frames" counter.  Each frame is split into
+  phases (event pump, key polling, joystick read, physics, collisions, draw,
+  display.update, tick sleep) timed with perf_counter_ns.  The last few
+  seconds of frames are kept in a ring buffer, (TimeRing), for rolling percentiles
+  (p50/p99/max) and fixed bin histograms over the same frames, (a frame
+  leaving the ring comes out of its bins), all in arrays allocated up front.
+
+  prof = FrameProfiler()
+  clock.tick(FPS);  prof.lap("tick")        # charge the time since the last
+  ...               prof.lap("events")      # lap to a phase
+  prof.end_frame()
+
+  prof.fps                                  # updated every 60 frames
+  prof.draw(win, font, text)                # optional overlay
+  prof.dump("profile.json")                 # on exit
+
+  NullProfiler has the same methods and does nothing, (headless runs).
+
+"""
+
+import json
+import time
+import numpy as np
+
+PHASES = ("events", "keys", "joystick", "physics", "collisions", "draw", "flip", "tick")
+
+
+"""
+  TimeRing:   ns timings of named rows for the last frames, oldest overwritten
+
+  The rolling window behind FrameProfiler's and LatencyTracer's (latency.py)
+  percentiles, one column per frame.
+"""
+class TimeRing:
+
+  def __init__(self, names, frames=600):
+    self.names = tuple(names)
+    self.ring = np.zeros((len(self.names), frames), dtype=np.int64)
+    self.count = 0
+
+  # add a frame's column, returns its index in ring
+  def add(self, column):
+    i = self.count % self.ring.shape[1]
+    self.ring[:, i] = column
+    self.count += 1
+    return i
+
+  # the columns in use, oldest first
+  def window(self):
+    size = self.ring.shape[1]
+    if self.count < size:
+      return self.ring[:, :self.count]
+    i = self.count % size
+    return np.concatenate((self.ring[:, i:], self.ring[:, :i]), axis=1)
+
+  """
+    percentiles:  {name: (p50, p99, max)} in ms over the rolling window
+  """
+  def percentiles(self):
+    data = self.window()
+    if data.shape[1] == 0:
+      return {name: (0.0, 0.0, 0.0) for name in self.names}
+    p = np.percentile(data, [50, 99], axis=1)/1e6
+    top = data.max(axis=1)/1e6
+    return {name: (float(p[0, i]), float(p[1, i]), float(top[i])) for i, name in enumerate(self.names)}
+
+  # one line per row, title heads the names column
+  def format(self, title):
+    lines = [f"{title:<10} {'p50':>6} {'p99':>6} {'max':>6}"]
+    for (name, (p50, p99, top)) in self.percentiles().items():
+      lines.append(f"{name:<10} {p50:6.2f} {p99:6.2f} {top:6.2f}")
+    return lines
+
+
+class FrameProfiler:
+  # histogram bins, 0.25 ms wide up to 50 ms, the last bin takes anything slower
+  BIN_NS = 250000
+  BINS = 200
+  # frames between fps/overlay updates
+  UPDATE = 60
+
+  def __init__(self, phases=PHASES, frames=600):
+    self.phases = phases
+    self.index = {p: i for i, p in enumerate(phases)}
+    # one row per phase plus the whole frame in the last row
+    self.rows = len(phases) + 1
+    self.times = TimeRing(phases + ("frame",), frames)
+    self.hist = np.zeros((self.rows, self.BINS), dtype=np.int64)
+    # each ring frame's bins, so they can be taken back out of hist
+    self.binring = np.zeros((self.rows, frames), dtype=np.int64)
+    self.bins = np.zeros(self.rows, dtype=np.int64)
+    self.cur = np.zeros(self.rows, dtype=np.int64)
+    self.rowidx = np.arange(self.rows)
+    self.frames = 0
+    self.fps = None
+    self.lines = []
+    self.overlay = False
+    self.last = time.perf_counter_ns()
+
+  # charge the time since the last lap to phase
+  def lap(self, phase):
+    now = time.perf_counter_ns()
+    self.cur[self.index[phase]] += now - self.last
+    self.last = now
+
+  def end_frame(self):
+    cur = self.cur
+    cur[-1] = cur[:-1].sum()
+    full = self.frames >= self.binring.shape[1]
+    i = self.times.add(cur)
+    if full:
+      self.hist[self.rowidx, self.binring[:, i]] -= 1
+    bins = np.floor_divide(cur, self.BIN_NS, out=self.bins)
+    np.minimum(bins, self.BINS - 1, out=bins)
+    self.binring[:, i] = bins
+    self.hist[self.rowidx, bins] += 1
+    cur[:] = 0
+    self.frames += 1
+
+    if self.frames % self.UPDATE == 0:
+      recent = self.times.window()[-1, -self.UPDATE:]
+      self.fps = int(1e9*len(recent)/recent.sum()) if recent.sum() else None
+      if self.overlay:
+        self.lines = self.times.format("phase")
+
+  """
+    draw:   the overlay, one line per phase, returns the drawn rects
+
+    text is a TextCache, the lines only change every UPDATE frames
+  """
+  def draw(self, win, font, text, pos=(10, 130), color=(255,255,255)):
+    if not self.overlay:
+      return []
+    (x, y) = pos
+    rects = []
+    for line in self.lines:
+      surface = text.render(font, line, color)
+      rects.append(win.blit(surface, (x, y)))
+      y += surface.get_height()
+    return rects
+
+  def dump(self, path):
+    data = {
+      "phases": list(self.phases) + ["frame"],
+      "frames": self.frames,
+      "percentiles_ms": self.times.percentiles(),
+      "hist_bin_ns": self.BIN_NS,
+      "hist": self.hist.tolist(),
+      "recent_ns": self.times.window().tolist(),
+    }
+    with open(path, "w") as f:
+      json.dump(data, f)
+
+
+class NullProfiler:
+  fps = None
+  overlay = False
+
+  def lap(self, phase):
+    pass
+
+  def end_frame(self):
+    pass
+
+  def draw(self, win, font, text, pos=(10, 130), color=(255,255,255)):
+    return []
@@ -0,0 +1,74 @@
+"""
+  Quality governor
+
+  Rainbow Pong's effects, the background cycling through colors, the
+  rainbow shift, the dashed mid line and the blinking GAME OVER, ran
+  whatever the load.  Every background change means a new background
+  surface and a full window flip instead of the dirty rects, so under load
+  they're what costs frames.  QualityGovernor watches the frame times and
+  picks an effect tier, the State asks it before each effect:
+
+    FULL        everything
+    REDUCED     no per-tick rainbow shift, GAME OVER doesn't blink
+    MINIMAL     the background only changes between show segments, no mid line
+
+  quality = QualityGovernor(budget_ms=0.8*1000/FPS)
+  if quality.allows("shift"): ...
+  quality.frame(ms)                       # the frame's time, minus the tick sleep
+  quality.tier                            # current QualityGovernor.TIER, for logging
+
+  It steps a tier down and back up by the same rule as the render scale,
+  (hysteresis.py), with HEADROOM of the budget to go back up.  budget_ms
+  None stays at FULL, (benchmarks).
+
+"""
+
+from enum import Enum
+from hysteresis import Hysteresis
+
+
+class QualityGovernor:
+  HEADROOM = 0.6
+
+  class TIER(Enum):
+    FULL = 1
+    REDUCED = 2
+    MINIMAL = 3
+
+  EFFECTS = {
+    TIER.FULL: {"cycle", "shift", "blink", "midline"},
+    TIER.REDUCED: {"cycle", "midline"},
+    TIER.MINIMAL: set(),
+  }
+
+  def __init__(self, budget_ms=None, tier=TIER.FULL):
+    self.budget_ms = budget_ms
+    self.tier = tier
+    self.effects = self.EFFECTS[tier]
+    self.load = Hysteresis(budget_ms, self.HEADROOM)
+    self.frames = 0
+    # (frame, tier, median ms) of every change
+    self.log = []
+
+  def allows(self, effect):
+    return effect in self.effects
+
+  """
+    frame:    add a frame's time in ms, returns True when the tier changed
+  """
+  def frame(self, ms):
+    self.frames += 1
+    if self.budget_ms is None:
+      return False
+    # (a step down is a higher TIER value)
+    step = self.load.frame(ms, self.tier != self.TIER.MINIMAL, self.tier != self.TIER.FULL)
+    if step:
+      return self.set_tier(self.TIER(self.tier.value + step), self.load.median)
+    return False
+
+  def set_tier(self, tier, median=0.0):
+    self.tier = tier
+    self.effects = self.EFFECTS[tier]
+    self.load.reset()
+    self.log.append((self.frames, tier.name, median))
+    return True
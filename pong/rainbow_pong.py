@@ -14,19 +14,34 @@
 
 import pygame
 import random
+import sys
 import time
 from enum import Enum
 from gpiozero import Button, MCP3008
-pygame.init()
-pygame.mixer.init()
+from ballpool import BallPool
+from broadphase import UniformGrid
+from dirty import DirtyRects
+from textcache import TextCache
+from layers import Compositor, midline
+from loop import FixedStep, lerp
+from sampler import JoystickSampler
+from profiler import FrameProfiler, NullProfiler
+from inputs import Inputs
+from assets import Assets, FONT_INDEX
+from sprites import BallSprites
+from timeline import Timeline
+from scaling import RenderTarget, BUDGET, options
+from quality import QualityGovernor
+from particles import Particles, NullParticles
 
 WIDTH, HEIGHT = 1400,800
-WIN = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Rainbow Pong")
 
 
 # throttle the FPS 
 FPS = 60
+# physics ticks per second, independent of the render FPS, (the show timing
+# in State.update_state counts ticks)
+TICK_RATE = FPS
 
 
 # Some colors 
@@ -37,6 +52,9 @@ PINK    = (228,39,245)
 LIME    = (187,245,39)
 TANG    = (245,169,39)
 BLUE    = (108, 199, 245)
+# by name, for show files
+COLORS = {"WHITE": WHITE, "BLACK": BLACK, "PURPLE": PURPLE, "PINK": PINK,
+          "LIME": LIME, "TANG": TANG, "BLUE": BLUE}
  
 # Other params
 PADDING = 5
@@ -54,6 +72,10 @@ class Joystick:
 
   def get_pressed(self):
     return self.button.is_pressed
+
+  # raw axes (0 to 1) and button, one read of everything for JoystickSampler
+  def read(self):
+    return (self.Vx.value, self.Vy.value, self.button.is_pressed)
   
   """
     get_dv:     returns (dvx, dvy) in world coordinates, (x: left to right, y: top to bottom)
@@ -68,6 +90,8 @@ class Joystick:
     dvy = int((self.Vy.value*2 - 1)*self.MAX_DV)
     return (dvx,dvy)
 
+# the first ball, only its launch position and velocity, BallPool moves,
+# collides and draws every ball from there
 class Ball:
   COLOR = WHITE
   vx=0
@@ -85,33 +109,7 @@ class Ball:
     if random.randint(1,3)%3 == 0:
       self.vx*=1
 
-  def reset(self):
-    self.x = WIDTH//2
-    self.y = HEIGHT//2
-    self.set_v()
-
-  def update(self):
-    self.x += self.vx
-    self.y += self.vy
-
-    # Collision with boundary checking
-    if self.x <=0:
-      self.vx = -self.vx
-    elif self.x >=WIDTH:
-      self.vx = -self.vx
-    if self.y <=0:
-      self.vy = -self.vy
-    elif self.y >=HEIGHT:
-      self.vy = -self.vy
-
-    if self.x < 0 or self.x > WIDTH or self.y < 0 or self.y > HEIGHT:
-      self.reset()
-
 
-  def draw(self, win):
-    pygame.draw.circle(win, self.COLOR, (self.x, self.y), self.radius)
-    
-  
 class Paddle:
   COLOR = WHITE
 
@@ -120,6 +118,12 @@ class Paddle:
     self.y = y
     self.width = width
     self.height = height
+    self.snapshot()
+
+  # remember the position at the start of a tick, for render interpolation
+  def snapshot(self):
+    self.px = self.x
+    self.py = self.y
     
   def update(self, dx, dy):
     
@@ -141,50 +145,30 @@ class Paddle:
       if (self.y < 0):
         self.y = 0
 
-  def draw(self, win):
-    pygame.draw.rect(win, self.COLOR, (self.x, self.y, self.width, self.height))
-
-# Collisions - if ball is moving right and hits left side of paddle
-def check_collision(ball, paddle):
-  score = 0
-
-  # check left side
-  if ( ball.x <= paddle.x ) and (ball.x + ball.radius >= paddle.x ):
-    if (ball.y > paddle.y) and (ball.y < paddle.y + paddle.height):
-      # Left side collision
-      if ball.vx > 0:
-        ball.vx= -ball.vx      
-        score+=1
-  
-  # need right side now
-  if ( ball.x >= paddle.x + paddle.width ) and (ball.x - ball.radius <= paddle.x + paddle.width):
-    if (ball.y > paddle.y) and (ball.y < paddle.y + paddle.height):
-      # Right side collision
-      if ball.vx < 0:
-        ball.vx= -ball.vx 
-        score+=1
-
-  # check top and bottom
-  if (ball.x >= paddle.x) and (ball.x <= paddle.x+paddle.width):
-    # vertical side
-    if (ball.y <= paddle.y) and (ball.y >= paddle.y - ball.radius):
-      if ball.vy == 0:
-        ball.vy = -2
-      elif ball.vy > 0:
-        ball.vy = -ball.vy
-      score+=1
-
-    # bottom side
-    if (ball.y >= paddle.y + paddle.height) and (ball.y <= paddle.y + paddle.height + ball.radius):
-      if ball.vy == 0:
-        ball.vy = 2
-      elif ball.vy < 0:
-        ball.vy = -ball.vy
-      score+=1
-    
-  return score
+  def draw(self, win, alpha=1.0, scale=1.0):
+    x = lerp(self.px, self.x, alpha)
+    y = lerp(self.py, self.y, alpha)
+    return pygame.draw.rect(win, self.COLOR, (x*scale, y*scale, self.width*scale, self.height*scale))
 
+"""
+  The show, (what update_state used to check every frame), see timeline.py
 
+  at/from/until in seconds, every in ticks, actions are State methods.  The
+  music cues (s1 at HYPE, s2 at HYPE2) are still off, they'd be
+  {"at": 8, "do": "play", "args": ["s1"]}.  python rainbow_pong.py --show
+  show.json plays a show from a file instead.
+"""
+SHOW = [
+  {"at": 8, "do": "segment", "args": ["HYPE", "PURPLE"]},
+  {"every": 14, "from": 8, "until": 34, "do": "cycle", "args": ["PURPLE", "PINK"]},
+  {"at": 34, "do": "segment", "args": ["MIDDLE", "BLUE"]},
+  {"every": 3, "from": 34, "until": 42, "do": "shift", "args": [1, 1, 1]},
+  {"at": 42, "do": "segment", "args": ["HYPE2", "PURPLE"]},
+  {"every": 8, "from": 42, "until": 74, "do": "cycle", "args": ["PURPLE", "PINK", "LIME", "TANG"]},
+  {"at": 74, "do": "game_over"},
+  {"every": 30, "from": 74, "do": "blink"},
+  {"every": 3, "from": 74, "do": "shift", "args": [1, 2, 3]},
+]
 
 
 """
@@ -197,20 +181,19 @@ def check_collision(ball, paddle):
 class State:
   # Spawn new balls
   MAX_BALLS = 5
+  # "ball storm" mode, python rainbow_pong.py --storm, STORM_SPAWN balls per button press
+  STORM_MAX_BALLS = 10000
+  STORM_SPAWN = 100
+  # seconds between spawns while the button is held
+  SPAWN_PERIOD = 1/3
   # background render color
   bg = BLACK
-  # counters used for state transitions, animations, IO
-  button_ctx = time_ctx = 0
-  # sounds
-  s1 = pygame.mixer.Sound("wav/chipmunk.wav")
-  s2 = pygame.mixer.Sound("wav/chipmunkend.wav")
+  # counter used for state transitions, animations
+  time_ctx = 0
+  # music tracks, set by main() so the State runs without audio (benchmarks)
+  s1 = s2 = None
   # state parameter
   animate = True
-
-  FPS_FONT = pygame.font.SysFont("DejaVuSansMono",35)
-  GAME_OVER_FONT = pygame.font.SysFont("FreeMono",120)
-  SCORE_FONT = pygame.font.SysFont("NotoSansMono-Bold",35)
-  fps_text = None
   score = 0
 
   # Primary state
@@ -231,25 +214,48 @@ class State:
     FIRST = 1
     SECOND = 2
 
-  def __init__(self, paddle, ball):
+  def __init__(self, paddle, ball, storm=False, profiler=None, assets=None, quality=None, particles=None):
     self.paddle = paddle
-    self.balls = []
-    self.balls.append(ball)
+    self.storm = storm
+    # balls live in a NumPy pool, see ballpool.py
+    self.balls = BallPool(self.STORM_MAX_BALLS if storm else self.MAX_BALLS, WIDTH, HEIGHT)
+    self.balls.spawn(ball.x, ball.y, ball.radius, ball.vx, ball.vy, ball.COLOR)
+    # broadphase cells fit the biggest ball, (radius up to 2*RADIUS)
+    self.grid = UniformGrid(WIDTH, HEIGHT, 4*RADIUS)
     self.state = self.STATE.BEGIN
-    self.seconds = time.time()
-
-  # Spawn up to MAX_BALLS 
+    # per-phase frame times and FPS, see profiler.py
+    self.profiler = profiler if profiler is not None else NullProfiler()
+    # which effects run, dropped under load, see quality.py
+    self.quality = quality if quality is not None else QualityGovernor()
+    # bursts where balls hit the paddle, see particles.py
+    self.particles = particles if particles is not None else NullParticles()
+    # only redraw/flip what changed, full flips when bg changes
+    self.rects = DirtyRects()
+    # score, fps and GAME OVER only get rendered when they change
+    self.text = TextCache()
+    # background color and mid line, baked into one surface
+    self.layers = Compositor((WIDTH, HEIGHT))
+    self.timeline = Timeline(TICK_RATE).load(SHOW)
+    # balls are blitted from pre-drawn circles, see sprites.py
+    self.sprites = BallSprites()
+    # what the balls, paddle and background are drawn into, the window unless
+    # main() sets a scaled one, see scaling.py
+    self.target = None
+    # fonts come from the cached font index, see assets.py
+    if assets is None:
+      assets = Assets()
+    self.FPS_FONT = assets.font("DejaVuSansMono",35)
+    self.GAME_OVER_FONT = assets.font("FreeMono",120)
+    self.SCORE_FONT = assets.font("NotoSansMono-Bold",35)
+
+  # Spawn up to MAX_BALLS, (STORM_SPAWN at a time in storm mode)
   def add_ball(self):
-    if self.button_ctx > 20:
-      self.button_ctx = 0
-      x = WIDTH//2 + random.randint(-WIDTH//4, WIDTH//4)
-      y = HEIGHT//2 + random.randint(-HEIGHT//4, HEIGHT//4)
-      r = RADIUS + random.randint(0, RADIUS)  
-      ball = Ball(x, y, r )
-      if len(self.balls) >= self.MAX_BALLS:
-        self.balls[random.randint(0,self.MAX_BALLS-1)]=ball
-      else:
-        self.balls.append(ball)  
+    k = self.STORM_SPAWN if self.storm else 1
+    rng = self.balls.rng
+    x = WIDTH//2 + rng.integers(-WIDTH//4, WIDTH//4, size=k, endpoint=True)
+    y = HEIGHT//2 + rng.integers(-HEIGHT//4, HEIGHT//4, size=k, endpoint=True)
+    r = RADIUS + rng.integers(0, RADIUS, size=k, endpoint=True)
+    self.balls.spawn(x, y, r)
 
   """
     Setting states deterministically, just playing around with animating the game play
@@ -261,173 +267,201 @@ class State:
       END       Game play off (show or offer play again option to transition to BEGIN?)
   """
   def update_state(self, keys):
-    self.button_ctx += 1
     self.time_ctx += 1
-    
-
-
-    for b in self.balls:
-      b.update()
-    for b in self.balls:
-      self.score += check_collision(b, self.paddle)
-
 
-    # Calculate FPS
-    if self.time_ctx % 60 == 0:
-      t2 = time.time()
-      dt = t2 - self.seconds
-      self.seconds = t2
-      fps = int(60/dt)
-      self.fps_text = self.FPS_FONT.render(f"FPS: {fps}", 1, WHITE)
+    self.balls.snapshot()
+    self.balls.update()
+    self.profiler.lap("physics")
+    self.balls.collide_balls(self.grid)
+    hits = self.balls.collide_paddle(self.paddle, self.grid)
+    self.score += hits
+    self.profiler.lap("collisions")
+    self.particles.update()
+    if hits:
+      self.particles.burst(self.balls.hit_x, self.balls.hit_y, 12, LIME, speed=4, life=24, size=3)
 
-    self.score_text = self.SCORE_FONT.render(f"Score: {self.score}", 1, WHITE)  
-
-    # State transition to HYPE state
-    if self.time_ctx == FPS*8:  ## after 8 seconds
-      #self.s1.play(fade_ms=100)
-      self.state = self.STATE.HYPE
-      self.hype = self.HYPE.FIRST
-      self.bg = PURPLE
-
-    # State transition to MIDDLE state
-    if self.time_ctx == FPS*34:
-      self.state = self.STATE.MIDDLE
-      self.bg = BLUE
-    
-    # State transition to HYPE2 state
-    if self.time_ctx == FPS*42:
-      #self.s2.play(fade_ms=100)
-      self.state = self.STATE.HYPE2
-      self.hype = self.HYPE.FIRST
-      self.bg = PURPLE
-
-    # Transition to END state
-    if self.time_ctx == FPS*74:
-      self.state = self.STATE.END
-      self.end_state = self.END.FIRST
-      self.animate = False
-    
-    # Toggle HYPE state
-    if (self.state == self.STATE.HYPE) and (self.time_ctx % 14 == 0):    
-      if self.hype == self.HYPE.FIRST:
-        self.hype = self.HYPE.SECOND
-        self.bg = PINK
-      else:
-        self.hype = self.HYPE.FIRST
-        self.bg = PURPLE
-
-    # Toggle HYPE2 state, (changes background colors)
-    if (self.state == self.STATE.HYPE2) and (self.time_ctx % 8 == 0):    
-      if self.hype == self.HYPE.FIRST:
-        self.hype = self.HYPE.SECOND
-        self.bg = PINK
-      elif self.hype == self.HYPE.SECOND:
-        self.hype = self.HYPE.THIRD
-        self.bg = LIME
-      elif self.hype == self.HYPE.THIRD:
-        self.hype = self.HYPE.FOURTH
-        self.bg = TANG
-      else:
-        self.hype = self.HYPE.FIRST
-        self.bg = PURPLE
-
-    # Toggle END state
-    if (self.state == self.STATE.END) and (self.time_ctx % 30 == 0):    
-      if self.end_state == self.END.FIRST:
-        self.end_state = self.END.SECOND
-      else:
-        self.end_state = self.END.FIRST
-
-    # Animate BG in middle
-    if (self.state == self.STATE.MIDDLE) and (self.time_ctx % 3 == 0):
-      # rotate through colors
-      r = (self.bg[0]+1)%255
-      g = (self.bg[1]+1)%255
-      b = (self.bg[2]+1)%255
-      self.bg = (r,g,b)
-  
-    # Animage BG in END
-    if (self.state == self.STATE.END) and (self.time_ctx % 3 == 0):
-      # rotate through colors
-      r = (self.bg[0]+1)%255
-      g = (self.bg[1]+2)%255
-      b = (self.bg[2]+3)%255
-      self.bg = (r,g,b)
+    # the show, backgrounds and state transitions, see SHOW and timeline.py
+    self.timeline.advance(self.time_ctx, self)
 
     # Add a reset function on spacebar key
     # pygame.K_SPACE
 
-    
-    
-
-  def draw(self, win):
-    # Draw any canvas details
-    win.fill(self.bg)
-    
-    # draw the fps
-    if self.fps_text:
-      win.blit(self.fps_text, (10, 10))
+    self.profiler.lap("physics")
+
+  # Show actions, dispatched by the timeline
+
+  # start a show segment, BEGIN/HYPE/MIDDLE/HYPE2, with its background
+  def segment(self, name, bg):
+    self.state = self.STATE[name]
+    self.hype = self.HYPE.FIRST
+    self.bg = COLORS[bg]
+
+  def game_over(self):
+    self.state = self.STATE.END
+    self.end_state = self.END.FIRST
+    self.animate = False
+
+  # next background in colors, hype tracks where we are
+  def cycle(self, *colors):
+    if not self.quality.allows("cycle"):
+      return
+    i = self.hype.value % len(colors)
+    self.hype = self.HYPE(i + 1)
+    self.bg = COLORS[colors[i]]
+
+  # GAME OVER blinks, (stays on when the governor says no)
+  def blink(self):
+    if self.end_state == self.END.FIRST and self.quality.allows("blink"):
+      self.end_state = self.END.SECOND
+    else:
+      self.end_state = self.END.FIRST
 
-    win.blit(self.score_text, (WIDTH - 200, 10))
-    # animate blinking blit for end game
-    if (self.state == self.STATE.END) and (self.end_state == self.END.FIRST):
-      win.blit(self.GAME_OVER_FONT.render("GAME OVER", 1, WHITE), (WIDTH//3,HEIGHT//3))
-      
-      
-    
+  # rotate through colors
+  def shift(self, dr, dg, db):
+    if not self.quality.allows("shift"):
+      return
+    (r, g, b) = self.bg
+    self.bg = ((r + dr)%255, (g + dg)%255, (b + db)%255)
+
+  def play(self, sound):
+    track = getattr(self, sound)
+    if track:
+      track.play(fade_ms=100)
+
+
+  def draw(self, win, alpha=1.0):
+    t0 = time.perf_counter()
+    if self.target is None or self.target.win is not win:
+      self.target = RenderTarget(win, (WIDTH, HEIGHT))
+    target = self.target
+    canvas = target.surface
+    s = target.scale
+    rects = self.rects
+    # Draw any canvas details, (erases what was drawn last frame)
+    # mid line comes and goes with animate, (and the quality tier)
+    layers = (midline,) if self.animate and self.quality.allows("midline") else ()
+    rects.begin(canvas, self.layers.background(self.bg, layers, canvas.get_size()))
   
     # Draw game objects
     if self.animate:
-      start_y, len_y = 20, 20
-      while(start_y < HEIGHT):
-        pygame.draw.line(win, WHITE, (WIDTH//2-5, start_y), (WIDTH//2-5, start_y + len_y), 10)
-        start_y += 2*len_y
-      
-      for ball in self.balls:
-        ball.draw(win)
-      self.paddle.draw(win)
+      rects.extend(self.balls.draw(canvas, alpha, self.sprites, s))
+      rects.add(self.paddle.draw(canvas, alpha, s))
+      rects.extend(self.particles.draw(canvas, alpha, self.sprites, s))
+
+    # up to the window, the text goes on top at full resolution
+    target.present()
+    hud = []
+    # draw the fps, and the per-phase overlay when profiling
+    if self.profiler.fps:
+      hud.append(win.blit(self.text.render(self.FPS_FONT, f"FPS: {self.profiler.fps}", WHITE), (10, 10)))
+    hud.extend(self.profiler.draw(win, self.FPS_FONT, self.text, (10, 50)))
+
+    hud.append(win.blit(self.text.render(self.SCORE_FONT, f"Score: {self.score}", WHITE), (WIDTH - 200, 10)))
+    # animate blinking blit for end game
+    if (self.state == self.STATE.END) and (self.end_state == self.END.FIRST):
+      hud.append(win.blit(self.text.render(self.GAME_OVER_FONT, "GAME OVER", WHITE), (WIDTH//3,HEIGHT//3)))
+    # scaled, the whole window is redrawn every frame
+    if target.native:
+      rects.extend(hud)
+    self.profiler.lap("draw")
+
+    rects.end(full=not target.native)
+    self.profiler.lap("flip")
+    # the next frame starts over at the new scale
+    if target.adapt(1000*(time.perf_counter() - t0)):
+      rects.invalidate()
+
+# python rainbow_pong.py --show path, None without --show
+def show_path():
+  if "--show" not in sys.argv:
+    return None
+  i = sys.argv.index("--show")
+  if i + 1 < len(sys.argv) and not sys.argv[i + 1].startswith("--"):
+    return sys.argv[i + 1]
+  sys.exit("usage: --show path, a JSON show file, (see SHOW)")
 
-    pygame.display.update()
 
 # main program control loop
 def main():
   run = True
+  # --scale S [--fixed-scale] draws the game at S times the window size, see scaling.py
+  (scale, adaptive) = options(sys.argv)
+  # --show path plays a show from a JSON file instead of SHOW
+  show = show_path()
+  # only the pygame modules we use, fonts through the index cached on disk, see assets.py
+  assets = Assets(FONT_INDEX)
+  assets.init("display", "font", "mixer")
+  with assets.timed("set_mode"):
+    win = pygame.display.set_mode((WIDTH, HEIGHT))
+  pygame.display.set_caption("Rainbow Pong")
   clock = pygame.time.Clock()
 
   paddle = Paddle(WIDTH - 20, HEIGHT - 200, 30, 200)
   ball = Ball(WIDTH//2, HEIGHT//2, RADIUS)
-  joystick = Joystick()
-  state = State(paddle, ball)
+  # joystick is read on its own thread, the loop never waits on SPI
+  stick = Joystick()
+  joystick = JoystickSampler(stick).start()
+  # keys and the joystick button come from the event queue, see inputs.py
+  keys = Inputs()
+  keys.watch(stick.button, "button")
+  # --profile shows the per-phase overlay, profile.json is written on exit either way
+  prof = FrameProfiler()
+  prof.overlay = "--profile" in sys.argv
+  # effects are shed when frames (minus the tick sleep) go over 80% of a frame
+  quality = QualityGovernor(0.8*1000/FPS)
+  particles = Particles(8192 if "--storm" in sys.argv else 2048)
+  state = State(paddle, ball, "--storm" in sys.argv, prof, assets, quality, particles)
+  state.target = RenderTarget(win, (WIDTH, HEIGHT), scale, BUDGET*1000/FPS if adaptive else None)
+  if show:
+    state.timeline = Timeline.from_file(show, TICK_RATE)
+  state.s1 = assets.music("wav/chipmunk.wav")
+  state.s2 = assets.music("wav/chipmunkend.wav")
+  state.draw(win)
+  assets.mark("first frame")
+  print(assets.report())
+  steps = FixedStep(TICK_RATE)
   #balls = [ball]
   #objs = [paddle,ball]
   
   while run:
     clock.tick(FPS)
+    prof.lap("tick")
+    start = time.perf_counter()
 
-    # process events
+    # process events, key and button changes update keys
     for event in pygame.event.get():
       if event.type == pygame.QUIT:
         run = False
         break
+      keys.handle(event)
+    prof.lap("events")
     
-    keys = pygame.key.get_pressed()
     if (keys[pygame.K_q]):
       run = False
       break                   
+    prof.lap("keys")
 
     # Check user inputs
     (dx, dy) = joystick.get_dv()
-    paddle.update(dx,dy)
-
-    if joystick.get_pressed():
-      state.add_ball()
-
-    # Update game states and redraw
-    state.update_state(keys)
-    state.draw(WIN)
-
-
-
+    prof.lap("joystick")
+
+    # Update game states at the fixed tick rate, redraw in between ticks
+    for _ in range(steps.advance()):
+      paddle.snapshot()
+      paddle.update(dx,dy)
+      # a ball on the press, then every SPAWN_PERIOD while it's held
+      if keys.repeat("button", state.SPAWN_PERIOD):
+        state.add_ball()
+      state.update_state(keys)
+      keys.end_tick()
+    state.draw(win, steps.alpha)
+    prof.end_frame()
+    if quality.frame(1000*(time.perf_counter() - start)):
+      (frame, tier, median) = quality.log[-1]
+      print(f"quality {tier} at frame {frame}, median frame {median:.1f} ms")
+
+  prof.dump("profile.json")
+  joystick.stop()
   pygame.quit()
 
 
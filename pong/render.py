@@ -0,0 +1,75 @@
+"""
+  Rendering interface shared by the pong games
+
+  A State only updates game objects, scores and timers.  A Renderer turns
+  a State into pixels, so pygame drawing is just one backend and the game
+  logic can run headless (no display, no GPIO, no frame cap), e.g. to tune
+  the paddle physics over millions of frames.
+
+  NullRenderer      draws nothing, counts frames
+  KeyState          held keys and their edges, stand-in for pygame.key.get_pressed()
+
+"""
+
+
+"""
+  Renderer:   base class, draws nothing, backends override draw()
+"""
+class Renderer:
+
+  # alpha: 0 to 1 between the previous and current physics tick, see loop.py
+  def draw(self, state, alpha=1.0):
+    pass
+
+  # release any display resources
+  def close(self):
+    pass
+
+
+class NullRenderer(Renderer):
+  frames = 0
+
+  def draw(self, state, alpha=1.0):
+    self.frames += 1
+
+
+"""
+  KeyState:   indexable like pygame.key.get_pressed(), True for held keys
+
+  Also keeps the edges, keys that went down or up since the last end_tick(),
+  so a key pressed and released between two ticks still reads as held for
+  one tick.  The keys it starts with were already held, they aren't edges.
+  inputs.Inputs fills one from the event queue.
+
+  keys = KeyState([pygame.K_w, pygame.K_SPACE])
+"""
+class KeyState:
+
+  def __init__(self, pressed=()):
+    self.pressed = set(pressed)
+    self.down = set()
+    self.up = set()
+
+  def __getitem__(self, key):
+    return key in self.pressed or key in self.down
+
+  def went_down(self, key):
+    return key in self.down
+
+  def went_up(self, key):
+    return key in self.up
+
+  def press(self, key):
+    if key not in self.pressed:
+      self.pressed.add(key)
+      self.down.add(key)
+
+  def release(self, key):
+    if key in self.pressed:
+      self.pressed.discard(key)
+      self.up.add(key)
+
+  # the tick has seen the edges, call after every update_state
+  def end_tick(self):
+    self.down.clear()
+    self.up.clear()
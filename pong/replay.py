@@ -0,0 +1,253 @@
+#!/usr/bin/python
+"""
+  Deterministic input recording and replay for pong
+
+  A game only depends on the ball launches (State's rng) and the input of
+  every physics tick, so the seed plus the per-tick input is enough to play
+  a match back exactly.  InputRecorder logs each tick as one 5 byte row,
+
+    keys      uint16 bitmask of KEYS
+    dx, dy    int8 joystick dv, already scaled by State.MAX_DV
+    button    uint8
+
+  into a NumPy array, and saves it after a small header (seed, frame count
+  and the final score/ball position to check a replay against).  About
+  18 KB per minute of play at 60 ticks.
+
+  python pong.py --record [match.rec]       # play as usual, saved on exit
+  python replay.py match.rec --repeat 100   # replay headless, as fast as possible
+
+  Recorded matches make repeatable physics bug reports and load tests.
+
+"""
+
+import argparse
+import random
+import struct
+import sys
+import time
+import numpy as np
+import pygame
+from render import NullRenderer
+
+# the keys the games look at, bit i of a frame's mask is KEYS[i]
+KEYS = (pygame.K_w, pygame.K_a, pygame.K_s, pygame.K_d, pygame.K_p, pygame.K_SPACE, pygame.K_m, pygame.K_q)
+BITS = {key: 1 << i for i, key in enumerate(KEYS)}
+
+FRAME = np.dtype([("keys", "<u2"), ("dx", "i1"), ("dy", "i1"), ("button", "u1")])
+# magic, version, seed, frames, score1, score2, ball x, ball y
+HEADER = struct.Struct("<6sHQIiidd")
+MAGIC = b"PONGIN"
+VERSION = 1
+
+
+def encode_keys(keys):
+  mask = 0
+  for (key, bit) in BITS.items():
+    if keys[key]:
+      mask |= bit
+  return mask
+
+
+"""
+  MaskKeys:   indexable like pygame.key.get_pressed(), from a KEYS bitmask
+
+  The edges are the bits that changed from the previous tick's mask.
+"""
+class MaskKeys:
+
+  def __init__(self, mask=0):
+    self.mask = mask
+    self.prev = 0
+
+  def __getitem__(self, key):
+    return bool(self.mask & BITS.get(key, 0))
+
+  def went_down(self, key):
+    return bool(self.mask & ~self.prev & BITS.get(key, 0))
+
+  def went_up(self, key):
+    return bool(~self.mask & self.prev & BITS.get(key, 0))
+
+  def end_tick(self):
+    pass
+
+
+"""
+  InputLog:   the seed and one FRAME row per tick
+
+  final is (score1, score2, ball x, ball y) at the end of the recording
+"""
+class InputLog:
+
+  def __init__(self, seed, frames, final=(0, 0, 0.0, 0.0)):
+    self.seed = seed
+    self.frames = frames
+    self.final = final
+
+  def __len__(self):
+    return len(self.frames)
+
+  def save(self, path):
+    with open(path, "wb") as f:
+      f.write(HEADER.pack(MAGIC, VERSION, self.seed, len(self.frames), *self.final))
+      f.write(self.frames.tobytes())
+
+  @classmethod
+  def load(cls, path):
+    with open(path, "rb") as f:
+      (magic, version, seed, n, *final) = HEADER.unpack(f.read(HEADER.size))
+      if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path}: not a version {VERSION} pong input log")
+      frames = np.frombuffer(f.read(n*FRAME.itemsize), dtype=FRAME)
+    if len(frames) != n:
+      raise ValueError(f"{path}: truncated, {len(frames)} of {n} frames")
+    return cls(seed, frames, tuple(final))
+
+
+# what a replay is checked against
+def final_state(state):
+  return (state.score1, state.score2, float(state.ball.x), float(state.ball.y))
+
+
+"""
+  InputRecorder:    wraps the joystick and logs the input of every tick
+
+  The State gets the recorder as its joystick.  step() samples the keys and
+  the joystick once per tick, the State then sees exactly what was logged:
+
+  recorder = InputRecorder(joystick, seed, State.MAX_DV)
+  state = State(recorder, rng=random.Random(seed))
+  state.update_state(recorder.step(keys))
+"""
+class InputRecorder:
+
+  def __init__(self, joystick, seed, max_dv, capacity=3600):
+    self.joystick = joystick
+    self.seed = seed
+    self.max_dv = max_dv
+    self.frames = np.zeros(capacity, dtype=FRAME)
+    self.n = 0
+    self.dv = (0, 0)
+    self.pressed = False
+    self.sampled = 0
+
+  def step(self, keys):
+    if self.joystick:
+      self.dv = self.joystick.get_dv(self.max_dv)
+      self.pressed = self.joystick.get_pressed()
+      sampled = getattr(self.joystick, "sampled_ns", None)
+      self.sampled = sampled() if sampled else time.perf_counter_ns()
+    # grow by doubling, a long match shouldn't reallocate every tick
+    if self.n == len(self.frames):
+      self.frames = np.concatenate((self.frames, np.zeros(len(self.frames), dtype=FRAME)))
+    row = self.frames[self.n]
+    row["keys"] = encode_keys(keys)
+    row["dx"] = self.dv[0]
+    row["dy"] = self.dv[1]
+    row["button"] = self.pressed
+    self.n += 1
+    return keys
+
+  # dv of this tick, max_dv was applied when it was sampled
+  def get_dv(self, max_dv=None):
+    return self.dv
+
+  def get_pressed(self):
+    return self.pressed
+
+  # when this tick's dv was read, (latency.py)
+  def sampled_ns(self):
+    return self.sampled
+
+  def log(self, state=None):
+    final = final_state(state) if state is not None else (0, 0, 0.0, 0.0)
+    return InputLog(self.seed, self.frames[:self.n].copy(), final)
+
+  def save(self, path, state=None):
+    self.log(state).save(path)
+
+
+"""
+  InputPlayer:    plays an InputLog back, in place of the keys and joystick
+
+  player = InputPlayer(log)
+  state = State(player, rng=random.Random(log.seed))
+  state.update_state(player.step())
+"""
+class InputPlayer:
+
+  def __init__(self, log):
+    # plain lists, indexing numpy rows one at a time is slow
+    self.keys = log.frames["keys"].tolist()
+    self.dx = log.frames["dx"].tolist()
+    self.dy = log.frames["dy"].tolist()
+    self.button = log.frames["button"].tolist()
+    self.i = -1
+    self.current = MaskKeys()
+
+  def step(self):
+    self.i += 1
+    self.current.prev = self.current.mask
+    self.current.mask = self.keys[self.i]
+    return self.current
+
+  def get_dv(self, max_dv=None):
+    return (self.dx[self.i], self.dy[self.i])
+
+  def get_pressed(self):
+    return bool(self.button[self.i])
+
+
+"""
+  replay:   feed a log through state.update_state, headless and unthrottled
+
+  state must have been built with an InputPlayer for the log as its joystick
+  and random.Random(log.seed) as its rng.  Returns (frames, seconds)
+"""
+def replay(state, player, frames, renderer=None):
+  if renderer is None:
+    renderer = NullRenderer()
+  t0 = time.perf_counter()
+  for _ in range(frames):
+    state.update_state(player.step())
+    renderer.draw(state)
+  return (frames, time.perf_counter() - t0)
+
+
+# argparse type for --repeat, at least once
+def positive(text):
+  n = int(text)
+  if n < 1:
+    raise argparse.ArgumentTypeError(f"must be at least 1, not {n}")
+  return n
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Replay a recorded pong match headless")
+  parser.add_argument("path", help="input log from pong.py --record")
+  parser.add_argument("--repeat", type=positive, default=1, help="replay the match this many times")
+  args = parser.parse_args()
+
+  import pong
+  log = InputLog.load(args.path)
+  total = (0, 0.0)
+  ok = True
+  for _ in range(args.repeat):
+    player = InputPlayer(log)
+    state = pong.State(player, rng=random.Random(log.seed))
+    (n, dt) = replay(state, player, len(log))
+    total = (total[0] + n, total[1] + dt)
+    ok = ok and final_state(state) == log.final
+
+  (n, dt) = total
+  # (an empty log takes no time)
+  rate = f"{n/dt:.0f}" if dt > 0 else "-"
+  print(f"{n} frames in {dt:.3f}s, {rate} frames/sec, score {state.score1}:{state.score2}")
+  if not ok:
+    print(f"replay diverged, recorded {log.final}, replayed {final_state(state)}")
+    sys.exit(1)
+
+
+if __name__=="__main__":
+  main()
@@ -0,0 +1,85 @@
+"""
+  Background joystick sampler
+
+  Joystick.get_dv does two blocking MCP3008 SPI reads, and it used to run on
+  the game loop every frame.  JoystickSampler reads the joystick on its own
+  thread at a fixed rate (faster than the frame rate if wanted), smooths the
+  axes, and publishes the latest sample as one immutable tuple.  Swapping a
+  reference is atomic, so the game loop never takes a lock or waits on SPI,
+  it just picks up whatever sample is newest.
+
+  joystick = JoystickSampler(Joystick(), rate=250).start()
+  (dx, dy) = joystick.get_dv(MAX_DV)      # same interface as Joystick
+  joystick.stop()
+
+"""
+
+import threading
+import time
+
+
+class JoystickSampler:
+
+  """
+    joystick:     anything with read() -> (vx, vy, pressed), raw axes 0 to 1
+    rate:         samples per second
+    smoothing:    weight of the previous value in the moving average, 0 is off
+  """
+  def __init__(self, joystick, rate=250, smoothing=0.5):
+    self.joystick = joystick
+    self.period = 1.0/rate
+    self.smoothing = smoothing
+    # (vx, vy, pressed, perf_counter_ns of the read), centered until the first read
+    self.latest = (0.5, 0.5, False, 0)
+    self.samples = 0
+    self.stopped = threading.Event()
+    self.thread = None
+
+  def start(self):
+    self.stopped.clear()
+    self.thread = threading.Thread(target=self.run, name="joystick", daemon=True)
+    self.thread.start()
+    return self
+
+  def stop(self):
+    self.stopped.set()
+    if self.thread:
+      self.thread.join()
+      self.thread = None
+
+  def run(self):
+    (vx, vy) = self.latest[:2]
+    a = self.smoothing
+    deadline = time.perf_counter()
+    while not self.stopped.is_set():
+      (x, y, pressed) = self.joystick.read()
+      t = time.perf_counter_ns()
+      vx = a*vx + (1 - a)*x
+      vy = a*vy + (1 - a)*y
+      # the handoff, one reference swap
+      self.latest = (vx, vy, pressed, t)
+      self.samples += 1
+
+      # fixed rate, skip ahead rather than burst after a stall
+      deadline += self.period
+      delay = deadline - time.perf_counter()
+      if delay > 0:
+        self.stopped.wait(delay)
+      else:
+        deadline = time.perf_counter()
+
+  def get_pressed(self):
+    return self.latest[2]
+
+  # perf_counter_ns of the newest sample's read, (latency.py)
+  def sampled_ns(self):
+    return self.latest[3]
+
+  """
+    get_dv:     returns (dvx, dvy) in world coordinates, see Joystick.get_dv
+  """
+  def get_dv(self, max_dv=6):
+    (vx, vy) = self.latest[:2]
+    dvx = int(-1*(vx*2 -1)*max_dv)
+    dvy = int((vy*2 - 1)*max_dv)
+    return (dvx,dvy)
@@ -0,0 +1,118 @@
+"""
+  Low resolution render target with adaptive scaling
+
+  Fill rate is the limit on the Pi 400: every ball, paddle and background
+  pixel drawn at full resolution costs.  RenderTarget gives the game an
+  offscreen Surface at scale times the world size to draw into, then
+  scales it up to the window in one transform.scale.  At 0.5 that's a
+  quarter of the pixels for everything in the world, (text is drawn on the
+  window afterwards, at full resolution, so it stays sharp).
+
+  At scale 1.0 the target is the window itself, nothing is scaled and the
+  dirty rect updates work as before.
+
+  target = RenderTarget(win, (WIDTH, HEIGHT), scale=1.0)
+  canvas = target.surface                 # draw the world here, in world
+  s = target.scale                        # coordinates times s
+  ...
+  target.present()                        # scale up to the window, (not at 1.0)
+  win.blit(text, ...)                     # the HUD, on the window
+  pygame.display.update()
+  target.adapt(draw_ms)                   # maybe change scale for next frame
+
+  adapt() steps down a level when the frames keep missing the budget, and
+  back up (never above the starting scale) when they've been well under it
+  for a while, (hysteresis.py, the same rule as the effect tiers).
+
+  python pong.py --scale 0.5 [--fixed-scale], (or rainbow_pong.py), starts at
+  half resolution, --fixed-scale stays there.
+
+"""
+
+import sys
+import pygame
+from hysteresis import Hysteresis
+
+LEVELS = (1.0, 0.75, 0.5)
+# of the frame time, for drawing and flipping
+BUDGET = 0.6
+
+
+# (scale, adaptive) from --scale S and --fixed-scale, exits with a usage line on a bad S
+def options(argv):
+  scale = 1.0
+  if "--scale" in argv:
+    i = argv.index("--scale")
+    try:
+      scale = float(argv[i + 1])
+    except (IndexError, ValueError):
+      scale = 0.0
+    if scale <= 0:
+      sys.exit("usage: --scale S [--fixed-scale], S times the window size, (0.5 for half)")
+  return (scale, "--fixed-scale" not in argv)
+
+
+class RenderTarget:
+  # step back up when drawing is well under this fraction of the budget, see hysteresis.py
+  HEADROOM = 0.5
+
+  """
+    win:        the display surface
+    size:       the world size the game draws in, (WIDTH, HEIGHT)
+    scale:      starting scale, and the highest adapt() goes back up to
+    budget_ms:  drawing time per frame, None never adapts
+  """
+  def __init__(self, win, size, scale=1.0, budget_ms=None, levels=LEVELS):
+    self.win = win
+    self.size = size
+    self.budget_ms = budget_ms
+    self.levels = tuple(s for s in levels if s <= scale) or (scale,)
+    if self.levels[0] != scale:
+      self.levels = (scale,) + self.levels
+    self.level = 0
+    self.load = Hysteresis(budget_ms, self.HEADROOM)
+    self.changes = 0
+    self.resize()
+
+  @property
+  def scale(self):
+    return self.levels[self.level]
+
+  # the window is the target, no scaling
+  @property
+  def native(self):
+    return self.scale == 1.0 and self.win.get_size() == self.size
+
+  def resize(self):
+    if self.native:
+      self.surface = self.win
+      return
+    (w, h) = self.size
+    size = (max(1, int(w*self.scale)), max(1, int(h*self.scale)))
+    # in the display's pixel format, so the scale up is a plain copy
+    self.surface = pygame.Surface(size).convert(self.win)
+
+  def present(self):
+    if self.surface is not self.win:
+      pygame.transform.scale(self.surface, self.win.get_size(), self.win)
+
+  """
+    adapt:    add a frame's drawing time, returns True when the scale changed
+
+    Whoever draws into surface needs a full redraw after a change, (the
+    surface is a new one, at the new size).
+  """
+  def adapt(self, ms):
+    if self.budget_ms is None:
+      return False
+    step = self.load.frame(ms, self.level + 1 < len(self.levels), self.level > 0)
+    if step:
+      return self.step(step)
+    return False
+
+  def step(self, direction):
+    self.level += direction
+    self.load.reset()
+    self.changes += 1
+    self.resize()
+    return True
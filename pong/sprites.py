@@ -0,0 +1,88 @@
+"""
+  Pre-rasterized ball sprites
+
+  pygame.draw.circle scan converts every ball in software, every frame, and
+  on the Pi's ARM cores that's most of the draw phase once there are a lot of
+  balls.  BallSprites draws each (radius, color) circle once into its own
+  small surface, and after that a ball is a blit, all of a frame's balls in
+  one Surface.blits.
+
+  sprites = BallSprites()
+  rects = sprites.draw(win, x, y, r, colors)   # arrays, like BallPool's
+  rect = sprites.blit(win, (x, y), r, color)   # one ball, like draw.circle
+
+  Without antialias the sprites are RLE colorkey surfaces, (the cheapest
+  blit pygame has), and pixel for pixel what draw.circle draws.  With
+  antialias the edges are drawn with gfxdraw on per pixel alpha surfaces.
+
+  One surface per sprite rather than one packed atlas surface, blitting an
+  area out of a big RLE surface is slower than draw.circle.
+
+"""
+
+import numpy as np
+import pygame
+import pygame.gfxdraw
+
+# colorkey for the non antialiased sprites, no ball should be this color
+KEY = (255, 0, 255)
+
+
+# sprite lookup key, radius and color packed in one int
+def key(r, color):
+  return r << 24 | color[0] << 16 | color[1] << 8 | color[2]
+
+
+class BallSprites:
+
+  def __init__(self, antialias=False):
+    self.antialias = antialias
+    # (radius << 24 | rgb) -> Surface
+    self.sprites = {}
+
+  # rasterize a circle
+  def add(self, r, color):
+    size = 2*r
+    if self.antialias:
+      sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+      pygame.gfxdraw.aacircle(sprite, r, r, r - 1, color)
+      pygame.gfxdraw.filled_circle(sprite, r, r, r - 1, color)
+    else:
+      sprite = pygame.Surface((size, size))
+      sprite.fill(KEY)
+      pygame.draw.circle(sprite, color, (r, r), r)
+      sprite.set_colorkey(KEY, pygame.RLEACCEL)
+    self.sprites[key(r, color)] = sprite
+    return sprite
+
+  def get(self, r, color):
+    sprite = self.sprites.get(key(r, color))
+    if sprite is None:
+      sprite = self.add(r, tuple(color))
+    return sprite
+
+  # one ball, returns the drawn Rect
+  def blit(self, win, pos, r, color):
+    return win.blit(self.get(r, color), (int(pos[0]) - r, int(pos[1]) - r))
+
+  """
+    draw:   x, y, r arrays and colors (n x 3 uint8), returns the drawn Rects
+
+    Centers are truncated to whole pixels the same way draw.circle does.
+  """
+  def draw(self, win, x, y, r, colors):
+    r = np.asarray(r, dtype=np.int64)
+    colors = np.asarray(colors, dtype=np.int64)
+    keys = r << 24 | colors[:, 0] << 16 | colors[:, 1] << 8 | colors[:, 2]
+    left = (np.asarray(x).astype(np.int64) - r).tolist()
+    top = (np.asarray(y).astype(np.int64) - r).tolist()
+
+    # only a handful of distinct sprites, look each one up once
+    (uniq, inverse) = np.unique(keys, return_inverse=True)
+    surfaces = []
+    for k in uniq.tolist():
+      sprite = self.sprites.get(k)
+      if sprite is None:
+        sprite = self.add(k >> 24, ((k >> 16) & 255, (k >> 8) & 255, k & 255))
+      surfaces.append(sprite)
+    return win.blits(zip(map(surfaces.__getitem__, inverse.tolist()), zip(left, top)))
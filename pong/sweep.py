@@ -0,0 +1,156 @@
+"""
+  Swept (continuous) collision detection
+
+  A discrete check after each step misses the paddle once the ball moves
+  further than the paddle width plus its radius in one step, it tunnels
+  through.  Sweeping the circle along its step instead finds the first
+  contact anywhere on the way.
+
+  A circle of radius r moving from p to p + d hits a box exactly when its
+  center (a ray) hits the box grown by r with rounded corners.  The ray is
+  tested against the grown box with the slab method, and if it lands in one
+  of the corner squares, against that corner's circle.
+
+  hit = sweep_circle_aabb(x, y, dx, dy, r, (left, top, right, bottom))
+  if hit:
+    (t, nx, ny) = hit     # time of impact 0..1 and the contact normal
+
+"""
+
+import math
+import numpy as np
+
+
+def _ray_circle(x, y, dx, dy, cx, cy, r):
+  # first t where |p + t*d - c| = r, or None
+  fx = x - cx
+  fy = y - cy
+  a = dx*dx + dy*dy
+  b = fx*dx + fy*dy
+  c = fx*fx + fy*fy - r*r
+  disc = b*b - a*c
+  if a == 0 or disc < 0 or c <= 0:
+    # no movement, no hit, or already overlapping
+    return None
+  t = (-b - math.sqrt(disc))/a
+  if t < 0 or t > 1:
+    return None
+  return t
+
+
+"""
+  sweep_circle_aabb:    first contact of a moving circle with a box
+
+  x, y:       circle center at the start of the step
+  dx, dy:     movement over the step
+  r:          radius
+  box:        (left, top, right, bottom), y down as on screen
+
+  returns (t, nx, ny), t in [0, 1] and (nx, ny) the unit normal of the box
+  surface at the contact, or None for no hit.  Circles that already overlap
+  the box at t = 0 are not reported, the discrete checks handle those.
+"""
+def sweep_circle_aabb(x, y, dx, dy, r, box):
+  (left, top, right, bottom) = box
+
+  # slab test against the box grown by r
+  t_enter = -math.inf
+  t_exit = math.inf
+  nx = ny = 0
+  for (p, d, lo, hi, axis) in ((x, dx, left - r, right + r, 0), (y, dy, top - r, bottom + r, 1)):
+    if d == 0:
+      if p < lo or p > hi:
+        return None
+      continue
+    t0 = (lo - p)/d
+    t1 = (hi - p)/d
+    # entering through the lo side means the normal points to -axis
+    n = -1 if d > 0 else 1
+    if t0 > t1:
+      t0, t1 = t1, t0
+    if t0 > t_enter:
+      t_enter = t0
+      (nx, ny) = (n, 0) if axis == 0 else (0, n)
+    t_exit = min(t_exit, t1)
+
+  if t_enter > t_exit or t_enter > 1:
+    return None
+  if t_enter < 0:
+    # starts inside the grown box, that's only a miss so far when it's in
+    # a corner square outside the rounded corner
+    t_enter = 0
+
+  # which corner square, if any, the grown box was entered through
+  hx = x + t_enter*dx
+  hy = y + t_enter*dy
+  cx = left if hx < left else right if hx > right else None
+  cy = top if hy < top else bottom if hy > bottom else None
+  if cx is None or cy is None:
+    if t_enter == 0:
+      return None
+    return (t_enter, nx, ny)
+
+  # rounded corner
+  t = _ray_circle(x, y, dx, dy, cx, cy, r)
+  if t is None:
+    return None
+  nx = (x + t*dx - cx)/r
+  ny = (y + t*dy - cy)/r
+  return (t, nx, ny)
+
+
+"""
+  sweep_many:   sweep_circle_aabb for arrays of circles and boxes, (vecpong.py)
+
+  Same arguments as arrays, (the box split into left, top, right, bottom),
+  returns (hit, t, nx, ny) arrays, t/nx/ny only meaningful where hit.  The
+  float operations are the scalar version's, so the results are identical.
+"""
+def sweep_many(x, y, dx, dy, r, left, top, right, bottom):
+  with np.errstate(divide="ignore", invalid="ignore"):
+    hit = np.ones(np.shape(x), dtype=bool)
+    slabs = []
+    for (p, d, lo, hi) in ((x, dx, left - r, right + r), (y, dy, top - r, bottom + r)):
+      still = d == 0
+      hit &= ~(still & ((p < lo) | (p > hi)))
+      safe = np.where(still, 1, d)
+      t0 = np.where(still, -np.inf, (lo - p)/safe)
+      t1 = np.where(still, np.inf, (hi - p)/safe)
+      (t0, t1) = (np.minimum(t0, t1), np.maximum(t0, t1))
+      n = np.where(d > 0, -1.0, 1.0)
+      slabs.append((t0, t1, n))
+    ((tx0, tx1, nx0), (ty0, ty1, ny0)) = slabs
+
+    # x wins ties, it's tested first in the scalar version
+    xfirst = tx0 >= ty0
+    t_enter = np.where(xfirst, tx0, ty0)
+    nx = np.where(xfirst, nx0, 0.0)
+    ny = np.where(xfirst, 0.0, ny0)
+    t_exit = np.minimum(tx1, ty1)
+    hit &= (t_enter <= t_exit) & (t_enter <= 1)
+    t_enter = np.maximum(t_enter, 0.0)
+
+    hx = x + t_enter*dx
+    hy = y + t_enter*dy
+    incx = (hx < left) | (hx > right)
+    incy = (hy < top) | (hy > bottom)
+    corner = incx & incy
+    hit &= corner | (t_enter != 0)
+
+    # rounded corners
+    cx = np.where(hx < left, left, right)
+    cy = np.where(hy < top, top, bottom)
+    fx = x - cx
+    fy = y - cy
+    a = dx*dx + dy*dy
+    b = fx*dx + fy*dy
+    c = fx*fx + fy*fy - r*r
+    disc = b*b - a*c
+    tc = (-b - np.sqrt(np.maximum(disc, 0)))/np.where(a == 0, 1, a)
+    ok = (a != 0) & (disc >= 0) & (c > 0) & (tc >= 0) & (tc <= 1)
+    hit &= ~corner | ok
+
+    t = np.where(corner, tc, t_enter)
+    nx = np.where(corner, (x + tc*dx - cx)/r, nx)
+    ny = np.where(corner, (y + tc*dy - cy)/r, ny)
+  return (hit, t, nx, ny)
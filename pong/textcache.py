@@ -0,0 +1,54 @@
+"""
+  Cached text surfaces
+
+  Font.render rasterizes the glyphs every call, and on the Pi that's one of
+  the most expensive parts of a frame, even though the scores, FPS and banners
+  almost never change.  TextCache keeps the rendered surfaces in a bounded LRU
+  keyed by (font, text, color), so a string is only rendered again once its
+  value changes (a new key) or it was evicted.
+
+  text = TextCache()
+  win.blit(text.render(FONT, f"Score: {score}", WHITE), (10, 10))
+
+"""
+
+from collections import OrderedDict
+
+
+class TextCache:
+
+  def __init__(self, maxsize=64):
+    self.maxsize = maxsize
+    self.surfaces = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+
+  def render(self, font, text, color, antialias=True):
+    key = (font, text, color, antialias)
+    surface = self.surfaces.get(key)
+    if surface is not None:
+      self.hits += 1
+      self.surfaces.move_to_end(key)
+      return surface
+
+    self.misses += 1
+    surface = font.render(text, antialias, color)
+    self.surfaces[key] = surface
+    if len(self.surfaces) > self.maxsize:
+      self.surfaces.popitem(last=False)
+    return surface
+
+  def clear(self):
+    self.surfaces.clear()
+
+  def __len__(self):
+    return len(self.surfaces)
+
+  def stats(self):
+    total = self.hits + self.misses
+    return {
+      "hits": self.hits,
+      "misses": self.misses,
+      "size": len(self.surfaces),
+      "hit_rate": self.hits/total if total else 0.0,
+    }
@@ -0,0 +1,90 @@
+"""
+  Timeline scheduler
+
+  Rainbow Pong's show used to be a list of `if time_ctx == FPS*8` and
+  `time_ctx % 14 == 0` checks, all of them tested every frame.  A Timeline
+  keeps keyframes (one off actions at a tick) and timers (actions every n
+  ticks inside a window) in a heap ordered by the tick they're next due, so
+  a frame only costs the events that are due, and a new show segment is one
+  more entry, not one more check per frame.
+
+  timeline = Timeline(TICK_RATE)
+  timeline.load(SHOW)                     # or Timeline.from_file("show.json", TICK_RATE)
+  ...
+  timeline.advance(time_ctx, state)       # once per tick
+
+  A show is a list of entries, the actions are method names on the target:
+
+    {"at": 8, "do": "segment", "args": ["HYPE", "PURPLE"]}
+    {"every": 14, "from": 8, "until": 34, "do": "cycle", "args": ["PURPLE", "PINK"]}
+
+  at, from and until are seconds, every is ticks.  Timers fire on multiples
+  of every, from inclusive and until exclusive, and after any keyframes due
+  on the same tick.
+
+"""
+
+import heapq
+import itertools
+import json
+
+# keyframes before timers on the same tick
+KEYFRAME = 0
+TIMER = 1
+
+
+class Timeline:
+
+  def __init__(self, rate=60):
+    self.rate = rate
+    self.heap = []
+    self.seq = itertools.count()
+    self.dispatched = 0
+
+  def __len__(self):
+    return len(self.heap)
+
+  def at(self, tick, action, *args):
+    heapq.heappush(self.heap, (tick, KEYFRAME, next(self.seq), action, args, 0, None))
+
+  # every period ticks, on multiples of period from start up to (not including) stop
+  def every(self, period, action, *args, start=0, stop=None):
+    first = -(-start//period)*period
+    if stop is None or first < stop:
+      heapq.heappush(self.heap, (first, TIMER, next(self.seq), action, args, period, stop))
+
+  def ticks(self, seconds):
+    return round(seconds*self.rate)
+
+  def load(self, show):
+    for entry in show:
+      args = entry.get("args", ())
+      if "every" in entry:
+        until = entry.get("until")
+        self.every(entry["every"], entry["do"], *args, start=self.ticks(entry.get("from", 0)),
+                   stop=None if until is None else self.ticks(until))
+      else:
+        self.at(self.ticks(entry["at"]), entry["do"], *args)
+    return self
+
+  @classmethod
+  def from_file(cls, path, rate=60):
+    with open(path) as f:
+      return cls(rate).load(json.load(f))
+
+  """
+    advance:    dispatch everything due up to tick, as target.<action>(*args)
+
+    Returns the number of actions dispatched.
+  """
+  def advance(self, tick, target):
+    heap = self.heap
+    n = 0
+    while heap and heap[0][0] <= tick:
+      (due, kind, _, action, args, period, stop) = heapq.heappop(heap)
+      getattr(target, action)(*args)
+      n += 1
+      if period and (stop is None or due + period < stop):
+        heapq.heappush(heap, (due + period, kind, next(self.seq), action, args, period, stop))
+    self.dispatched += n
+    return n
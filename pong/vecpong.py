@@ -0,0 +1,270 @@
+"""
+  Vectorized pong, many games at once
+
+  For training and evaluating paddle controllers.  VecPong steps N
+  independent games of pong.py's PLAY/WAIT/END rules, (ball update, wall
+  bounces, sweep + discrete check_collision, bounce momentum transfer and
+  vMAX clamping, the 60 tick wait after a point, first to 10), with every
+  ball, paddle and score in NumPy arrays, so a step costs about the same for
+  1 or 1024 games.
+
+  env = VecPong(1024)
+  obs = env.reset()
+  (obs, scored, done) = env.step(left_dv, right_dv)
+
+  left_dv, right_dv:  (N, 2) paddle moves (dx, dy), clipped to State.MAX_DV,
+                      applied like the joystick, one Paddle.update per tick
+  obs:                (N, OBS) float32, see OBS_FIELDS
+  scored:             (N, 2) points won this step by player 1 (left) and 2 (right)
+  done:               (N,) games that reached END this step
+
+  Finished games start over on the next step with autoreset, otherwise they
+  stay in END and don't change.  The ball launches come from a NumPy
+  Generator rather than the random module, so the rules match pong.py but
+  not a particular game.
+
+"""
+
+import numpy as np
+import pong
+from sweep import sweep_many
+
+# game phases, pong.State.STATE without BEGIN
+PLAY = 0
+WAIT = 1
+END = 2
+
+OBS_FIELDS = ("ball_x", "ball_y", "ball_vx", "ball_vy", "left_x", "left_y", "right_x", "right_y",
+              "score1", "score2", "waiting")
+
+
+class VecPong:
+  PADDLE_W = 30
+  PADDLE_H = 200
+  WAIT_TICKS = 60
+  WIN_SCORE = 10
+
+  def __init__(self, n, rng=None, autoreset=True):
+    self.n = n
+    self.rng = rng if rng is not None else np.random.default_rng()
+    self.autoreset = autoreset
+    # pong.py's module globals at construction, (bench.py changes them)
+    self.width = pong.WIDTH
+    self.height = pong.HEIGHT
+    self.radius = pong.RADIUS
+    self.padding = pong.Ball.PADDING
+    self.max_dv = pong.State.MAX_DV
+    # paddle x range, the field edges and the mid-line, [0] left, [1] right
+    (w, pw) = (self.width, self.PADDLE_W)
+    self.xmin = np.array([[0], [w//2 + pw//2]])
+    self.xmax = np.array([[w//2 - pw - pw//2], [w - pw]])
+
+    self.x = np.zeros(n)
+    self.y = np.zeros(n)
+    self.px = np.zeros(n)
+    self.py = np.zeros(n)
+    self.vx = np.zeros(n)
+    self.vy = np.zeros(n)
+    # paddles, [0] left, [1] right
+    self.padx = np.zeros((2, n))
+    self.pady = np.zeros((2, n))
+    self.score = np.zeros((2, n), dtype=np.int32)
+    self.phase = np.zeros(n, dtype=np.int8)
+    self.wait = np.zeros(n, dtype=np.int32)
+    self.launch_right = np.ones(n, dtype=bool)
+    self.steps = 0
+
+  """
+    reset:    start games over, all of them or where mask is True, returns obs()
+  """
+  def reset(self, mask=None):
+    if mask is None:
+      mask = np.ones(self.n, dtype=bool)
+    w, h = self.width, self.height
+    self.padx[0, mask] = 20
+    self.padx[1, mask] = w - 20 - self.PADDLE_W
+    self.pady[:, mask] = h//2 - 100
+    self.score[:, mask] = 0
+    self.phase[mask] = PLAY
+    self.wait[mask] = 0
+    self.launch_right[mask] = True
+    self.center(mask)
+    self.launch(mask, np.ones(self.n, dtype=bool))
+    return self.obs()
+
+  def center(self, mask):
+    self.x[mask] = self.px[mask] = self.width//2
+    self.y[mask] = self.py[mask] = self.height//2
+
+  # Ball.launch, right picks the direction per game
+  def launch(self, mask, right):
+    k = np.count_nonzero(mask)
+    vx = self.rng.integers(3, 7, size=k)
+    self.vx[mask] = np.where(right[mask], vx, -vx)
+    self.vy[mask] = self.rng.integers(-6, 7, size=k)
+
+  def obs(self):
+    return np.stack((self.x, self.y, self.vx, self.vy, self.padx[0], self.pady[0],
+                     self.padx[1], self.pady[1], self.score[0], self.score[1],
+                     self.phase == WAIT), axis=1).astype(np.float32)
+
+  """
+    move_paddles:   Paddle.update for both paddles of the games in mask
+
+    dvx, dvy are (2, N).  With the paddles always inside their half, the
+    boundary and mid-line checks of Paddle.update come down to one clip.
+  """
+  def move_paddles(self, dvx, dvy, mask):
+    x = np.clip(self.padx + dvx, self.xmin, self.xmax)
+    y = np.clip(self.pady + dvy, 0, self.height - self.PADDLE_H)
+    self.padx = np.where(mask, x, self.padx)
+    self.pady = np.where(mask, y, self.pady)
+
+  # Ball.bounce off paddle p where mask
+  def bounce(self, mask, p):
+    if not mask.any():
+      return
+    vx = np.where(mask, -self.vx, self.vx)
+    ph = self.PADDLE_H
+    dy_ball = self.y - (self.pady[p] + ph//2)
+    vy = self.vy + pong.Ball.SCALE*dy_ball/ph//2
+    vmax = pong.Ball.vMAX
+    vx = np.where(mask & (np.abs(vy) > vmax), vx + np.where(vx > 0, 2, -2), vx)
+    vy = np.trunc(np.where(vy <= 0, np.maximum(vy, -vmax), np.minimum(vy, vmax)))
+    self.vx = vx
+    self.vy = np.where(mask, vy, self.vy)
+
+  def bounce_up(self, mask):
+    if not mask.any():
+      return
+    self.vy = np.where(mask & (self.vy == 0), -2, np.where(mask & (self.vy > 0), -self.vy, self.vy))
+
+  def bounce_down(self, mask):
+    if not mask.any():
+      return
+    self.vy = np.where(mask & (self.vy == 0), 2, np.where(mask & (self.vy < 0), -self.vy, self.vy))
+
+  # a mask over all games from one over the games in idx
+  def expand(self, idx, m):
+    full = np.zeros(self.n, dtype=bool)
+    full[idx] = m
+    return full
+
+  # Ball.sweep, returns the games where it hit and bounced
+  def sweep(self, mask):
+    (x, y, px, py, r) = (self.x, self.y, self.px, self.py, self.radius)
+    pw, ph = self.PADDLE_W, self.PADDLE_H
+    # only sweep the games where the step's bounds touch a paddle, (few)
+    (x0, x1) = (np.minimum(px, x) - r, np.maximum(px, x) + r)
+    (y0, y1) = (np.minimum(py, y) - r, np.maximum(py, y) + r)
+    near = np.zeros(self.n, dtype=bool)
+    for p in (0, 1):
+      (padx, pady) = (self.padx[p], self.pady[p])
+      near |= (x1 >= padx) & (x0 <= padx + pw) & (y1 >= pady) & (y0 <= pady + ph)
+    idx = np.flatnonzero(mask & near & ((x != px) | (y != py)))
+    hit = np.zeros(self.n, dtype=bool)
+    if len(idx) == 0:
+      return hit
+
+    (px, py) = (px[idx], py[idx])
+    dx = x[idx] - px
+    dy = y[idx] - py
+    k = len(idx)
+    first = np.full(k, -1)
+    (t, nx, ny) = (np.full(k, np.inf), np.zeros(k), np.zeros(k))
+    for p in (0, 1):
+      (padx, pady) = (self.padx[p, idx], self.pady[p, idx])
+      (found, tp, nxp, nyp) = sweep_many(px, py, dx, dy, r, padx, pady, padx + pw, pady + ph)
+      better = found & (tp < t)
+      first = np.where(better, p, first)
+      t = np.where(better, tp, t)
+      nx = np.where(better, nxp, nx)
+      ny = np.where(better, nyp, ny)
+
+    found = first >= 0
+    side = np.abs(nx) >= np.abs(ny)
+    # only the faces towards the middle, the ball passes through the back
+    front = ((first == 0) & (nx > 0)) | ((first == 1) & (nx < 0))
+    hit[idx] = found & (~side | front)
+    h = hit[idx]
+    # to the point of contact before bouncing, like Ball.sweep
+    self.x[idx[h]] = px[h] + t[h]*dx[h]
+    self.y[idx[h]] = py[h] + t[h]*dy[h]
+    self.bounce(self.expand(idx, h & side & (first == 0)), 0)
+    self.bounce(self.expand(idx, h & side & (first == 1)), 1)
+    self.bounce_up(self.expand(idx, h & ~side & (ny < 0)))
+    self.bounce_down(self.expand(idx, h & ~side & (ny >= 0)))
+    return hit
+
+  # Ball.check_collision
+  def check_collision(self, mask):
+    mask = mask & ~self.sweep(mask)
+    (x, y, r) = (self.x, self.y, self.radius)
+    pw, ph = self.PADDLE_W, self.PADDLE_H
+    (lx, rx) = self.padx
+    (ly, ry) = self.pady
+
+    # left face of the right paddle, right face of the left paddle
+    self.bounce(mask & (x <= rx) & (x + r >= rx) & (y >= ry) & (y <= ry + ph) & (self.vx > 0), 1)
+    self.bounce(mask & (x >= lx + pw) & (x <= lx + pw + r) & (y > ly) & (y < ly + ph) & (self.vx < 0), 0)
+
+    # top and bottom
+    for p in (0, 1):
+      (padx, pady) = (self.padx[p], self.pady[p])
+      over = mask & (x >= padx) & (x <= padx + pw)
+      self.bounce_up(over & (y <= pady) & (y >= pady - r))
+      self.bounce_down(over & (y >= pady + ph) & (y <= pady + ph + r))
+
+  """
+    step:   one tick of every game, returns (obs, scored, done)
+  """
+  def step(self, left_dv, right_dv):
+    m = self.max_dv
+    dv = np.clip(np.stack((left_dv, right_dv)), -m, m)
+    (dvx, dvy) = (dv[..., 0], dv[..., 1])
+    play = self.phase == PLAY
+    wait = self.phase == WAIT
+    scored = np.zeros((self.n, 2), dtype=np.int32)
+
+    self.px[:] = self.x
+    self.py[:] = self.y
+
+    # PLAY
+    self.move_paddles(dvx, dvy, play)
+    self.x = np.where(play, self.x + self.vx, self.x)
+    self.y = np.where(play, self.y + self.vy, self.y)
+    pad = self.padding
+    p2 = play & (self.x <= -pad)
+    p1 = play & ~p2 & (self.x >= self.width + pad)
+    point = p1 | p2
+    # a point puts the ball back in the middle, launched right, (Ball.reset)
+    self.center(point)
+    self.launch(point, np.ones(self.n, dtype=bool))
+    rest = play & ~point
+    self.vy = np.where(rest & ((self.y <= pad) | (self.y >= self.height + pad)), -self.vy, self.vy)
+
+    scored[:, 0] = p1
+    scored[:, 1] = p2
+    self.score += scored.T
+    self.launch_right = np.where(p1, True, np.where(p2, False, self.launch_right))
+    done = point & (self.score.max(axis=0) >= self.WIN_SCORE)
+    self.phase[done] = END
+    waiting = point & ~done
+    self.phase[waiting] = WAIT
+    self.wait[waiting] = 0
+    self.check_collision(rest)
+
+    # WAIT, including the games that just scored, (so their paddles move twice
+    # on that tick, like State.update_state)
+    wait |= waiting
+    self.move_paddles(dvx, dvy, wait | done)
+    self.wait[wait] += 1
+    serve = wait & (self.wait % self.WAIT_TICKS == 0)
+    self.phase[serve] = PLAY
+    self.center(serve)
+    self.launch(serve, self.launch_right)
+
+    self.steps += 1
+    if self.autoreset and done.any():
+      self.reset(done)
+    return (self.obs(), scored, done)